@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+TikTok Moderator Local Classifier Benchmark
+
+Collects moderation API verdicts for the comments of sessions recorded with
+`moderator_cool.py --record`, trains the local moderation model on part of
+them, and compares its throughput and agreement with the API on the rest.
+
+Example:
+    python benchmark_moderation.py session.jsonl --verdicts verdicts.jsonl --train local_model.npz
+    python moderator_cool.py --channel @user --moderation-engine local --local-model local_model.npz
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import List, Dict, Any, Tuple
+
+from replay_moderator import FakeOpenAIServer, load_session
+from tiktok_moderator import LocalClassifier, LocalModerationEngine, OpenAIModerationEngine
+
+
+def flagged_scores(result: Any) -> Dict[str, float]:
+    """Return the flagged categories of a moderation result and their scores."""
+    if not result.flagged:
+        return {}
+    return {
+        category: getattr(result.category_scores, category)
+        for category in result.categories.__dict__
+        if getattr(result.categories, category)
+    }
+
+
+def load_verdicts(path: str) -> Dict[str, Dict[str, float]]:
+    """Read the verdicts collected by previous runs."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {
+            record["text"]: record["scores"]
+            for record in map(json.loads, f) if record
+        }
+
+
+async def fetch_verdicts(comment_texts: List[str], batch_size: int) -> Dict[str, Dict[str, float]]:
+    """Moderate comments with the API, one batch at a time."""
+    engine = OpenAIModerationEngine()
+    verdicts = {}
+    for start in range(0, len(comment_texts), batch_size):
+        batch = comment_texts[start:start + batch_size]
+        for comment_text, result in zip(batch, await engine.moderate(batch)):
+            verdicts[comment_text] = flagged_scores(result)
+    return verdicts
+
+
+def agreement(expected: List[Dict[str, float]], predicted: List[Dict[str, float]]) -> Dict[str, Any]:
+    """Compare the local verdicts with the API's, on flagged and per category."""
+    pairs = list(zip((bool(verdict) for verdict in expected), (bool(verdict) for verdict in predicted)))
+    both = sum(1 for api, local in pairs if api and local)
+    api_flagged = sum(1 for api, _ in pairs if api)
+    local_flagged = sum(1 for _, local in pairs if local)
+    categories = {}
+    for api, local in zip(expected, predicted):
+        for category in set(api) | set(local):
+            counts = categories.setdefault(category, [0, 0, 0])
+            counts[0] += category in api
+            counts[1] += category in local
+            counts[2] += category in api and category in local
+    return {
+        "accuracy": sum(1 for api, local in pairs if api == local) / len(pairs) if pairs else 0.0,
+        "precision": both / local_flagged if local_flagged else 0.0,
+        "recall": both / api_flagged if api_flagged else 0.0,
+        "api_flagged": api_flagged,
+        "local_flagged": local_flagged,
+        "categories": categories,
+    }
+
+
+def print_report(
+    comment_count: int,
+    split: Tuple[int, int],
+    api_throughput: float,
+    local_throughput: float,
+    result: Dict[str, Any]
+) -> None:
+    """Print the benchmark report."""
+    print("\n=== Moderation benchmark ===")
+    print(f"Comments: {comment_count} unique, {split[0]} for training, {split[1]} for evaluation")
+    if api_throughput:
+        print(f"API throughput: {api_throughput:.1f} comments/s (sequential batches)")
+    print(f"Local throughput: {local_throughput:.1f} comments/s")
+    print(
+        f"Agreement with the API: {result['accuracy']:.1%} "
+        f"(precision {result['precision']:.1%}, recall {result['recall']:.1%}, "
+        f"{result['api_flagged']} flagged by the API, {result['local_flagged']} locally)"
+    )
+    for category, (api, local, both) in sorted(result["categories"].items()):
+        print(f"  {category}: API {api}, local {local}, both {both}")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Train the local moderation model and compare it with the moderation API"
+    )
+    parser.add_argument('sessions', nargs='+', help='JSONL files recorded with moderator_cool.py --record')
+    parser.add_argument('--verdicts', type=str, help='JSONL file caching the API verdicts between runs')
+    parser.add_argument('--train', type=str, help='Train a model and save it to this .npz file')
+    parser.add_argument('--model', type=str, help='Evaluate this model instead of training one')
+    parser.add_argument('--test-share', type=float, default=0.2, help='Share of the comments kept for evaluation (default: 0.2)')
+    parser.add_argument('--epochs', type=int, default=200, help='Training passes over the comments (default: 200)')
+    parser.add_argument('--workers', type=int, help='Number of workers of the local model (default: number of CPUs)')
+    parser.add_argument('--processes', action='store_true', help='Run the local model in worker processes instead of threads')
+    parser.add_argument('--batch-size', type=int, default=32, help='Comments per moderation batch (default: 32)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the train/evaluation split (default: 0)')
+    parser.add_argument('--fake', action='store_true', help='Collect verdicts from a local fake API (random flags) instead of OpenAI')
+    parser.add_argument('--flag-rate', type=float, default=0.05, help='Share of comments flagged by the fake API (default: 0.05)')
+    args = parser.parse_args()
+    if bool(args.train) == bool(args.model):
+        parser.error("exactly one of --train and --model is required")
+    return args
+
+
+def main() -> None:
+    """Main entry point for the script."""
+    args = parse_arguments()
+    comment_texts = list(dict.fromkeys(
+        record["comment"] for path in args.sessions for record in load_session(path)
+    ))
+
+    server = None
+    if args.fake:
+        server = FakeOpenAIServer(latency_ms=100, flag_rate=args.flag_rate, seed=args.seed)
+        server.start()
+        # The OpenAI client reads its configuration when it is first used
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "benchmark"
+
+    verdicts = load_verdicts(args.verdicts)
+    missing = [comment_text for comment_text in comment_texts if comment_text not in verdicts]
+    api_throughput = 0.0
+    if missing:
+        print(f"Moderating {len(missing)} comments with the API...")
+        start = time.perf_counter()
+        fetched = asyncio.run(fetch_verdicts(missing, args.batch_size))
+        api_throughput = len(missing) / (time.perf_counter() - start)
+        verdicts.update(fetched)
+        if args.verdicts:
+            with open(args.verdicts, "a", encoding="utf-8") as f:
+                for comment_text, scores in fetched.items():
+                    f.write(json.dumps({"text": comment_text, "scores": scores}, ensure_ascii=False) + "\n")
+    if server is not None:
+        server.stop()
+
+    shuffled = comment_texts[:]
+    random.Random(args.seed).shuffle(shuffled)
+    test_size = max(1, int(len(shuffled) * args.test_share))
+    test, train = shuffled[:test_size], shuffled[test_size:]
+
+    model_path = args.model
+    if args.train:
+        print(f"Training on {len(train)} comments...")
+        classifier = LocalClassifier.train(
+            train,
+            [verdicts[comment_text] for comment_text in train],
+            epochs=args.epochs
+        )
+        classifier.save(args.train)
+        model_path = args.train
+
+    engine = LocalModerationEngine(model_path, workers=args.workers, processes=args.processes)
+
+    async def classify_all() -> List[Any]:
+        # Batches arrive concurrently in the moderator, so they are classified together
+        batches = await asyncio.gather(*(
+            engine.moderate(comment_texts[start:start + args.batch_size])
+            for start in range(0, len(comment_texts), args.batch_size)
+        ))
+        return [result for batch in batches for result in batch]
+
+    asyncio.run(engine.moderate(test[:1]))  # Start the workers
+    start = time.perf_counter()
+    results = dict(zip(comment_texts, asyncio.run(classify_all())))
+    local_throughput = len(comment_texts) / (time.perf_counter() - start)
+    engine.close()
+
+    print_report(
+        len(comment_texts),
+        (len(train), len(test)),
+        api_throughput,
+        local_throughput,
+        agreement(
+            [verdicts[comment_text] for comment_text in test],
+            [flagged_scores(results[comment_text]) for comment_text in test]
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
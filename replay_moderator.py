@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+TikTok Moderator Replay Harness
+
+Replays comments recorded with `moderator_cool.py --record` into
+TikTokModerator.on_comment, against a local stand-in for the OpenAI API,
+and reports latency, throughput, API calls and memory growth.
+
+Example:
+    python replay_moderator.py session.jsonl --speed 10 --latency-ms 200 -- --workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple
+
+import tiktok_moderator
+
+MODERATION_CATEGORIES = [
+    "harassment", "harassment/threatening", "hate", "hate/threatening",
+    "illicit", "illicit/violent", "self-harm", "self-harm/instructions",
+    "self-harm/intent", "sexual", "sexual/minors", "violence",
+    "violence/graphic",
+]
+
+
+class FakeOpenAIServer:
+    """Local stand-in for the OpenAI API with configurable latency and errors."""
+
+    def __init__(
+        self,
+        latency_ms: float = 100,
+        jitter_ms: float = 0,
+        error_rate: float = 0.0,
+        flag_rate: float = 0.05,
+        seed: int = 0
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            latency_ms: Time taken by each response, in milliseconds
+            jitter_ms: Maximum random extra latency, in milliseconds
+            error_rate: Share of requests answered with a 500 error
+            flag_rate: Share of moderation inputs flagged as harassment
+            seed: Seed of the random generator
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.flag_rate = flag_rate
+        self.calls = {"moderations": 0, "chat": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> None:
+        """Serve requests from a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def _moderation(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        inputs = body.get("input")
+        if not isinstance(inputs, list):
+            inputs = [inputs]
+        results = []
+        for _ in inputs:
+            flagged = self._draw() < self.flag_rate
+            results.append({
+                "flagged": flagged,
+                "categories": {category: flagged and category == "harassment" for category in MODERATION_CATEGORIES},
+                "category_scores": {category: 0.9 if flagged and category == "harassment" else 0.01 for category in MODERATION_CATEGORIES},
+                "category_applied_input_types": {category: ["text"] for category in MODERATION_CATEGORIES},
+            })
+        return {"id": "modr-replay", "model": body.get("model", ""), "results": results}
+
+    REPLY = (
+        "Merci pour ton message, c'est une super question ! Je suis un robot, "
+        "je n'ai pas d'âge, mais je suis là pour répondre au chat pendant tout le live."
+    )
+
+    @classmethod
+    def _chat(cls, body: Dict[str, Any]) -> Dict[str, Any]:
+        content = cls.REPLY
+        prompt_tokens = sum(len(message.get("content", "")) // 4 + 1 for message in body.get("messages", []))
+        return {
+            "id": "chatcmpl-replay",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4 + 1,
+                "total_tokens": prompt_tokens + len(content) // 4 + 1,
+            },
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                delay = server.latency_ms + server._draw() * server.jitter_ms
+                time.sleep(delay / 1000)
+
+                endpoint = "moderations" if self.path.endswith("/moderations") else "chat"
+                with server._lock:
+                    server.calls[endpoint] += 1
+                if server._draw() < server.error_rate:
+                    with server._lock:
+                        server.calls["errors"] += 1
+                    self._reply(500, {"error": {"message": "Simulated error", "type": "server_error"}})
+                elif endpoint == "moderations":
+                    self._reply(200, server._moderation(body))
+                elif body.get("stream"):
+                    usage = server._chat(body)["usage"] if body.get("stream_options", {}).get("include_usage") else None
+                    self._stream(server.REPLY.split(" "), server.latency_ms / 10, usage)
+                else:
+                    self._reply(200, server._chat(body))
+
+            def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, words: List[str], delay_ms: float, usage: Optional[Dict[str, int]] = None) -> None:
+                """Send the reply word by word as server-sent events, then its usage if requested."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for index, word in enumerate(words):
+                    chunk = {
+                        "id": "chatcmpl-replay",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": "replay",
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": word if index == 0 else " " + word},
+                            "finish_reason": None,
+                        }],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(delay_ms / 1000)
+                if usage is not None:
+                    chunk = {
+                        "id": "chatcmpl-replay",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": "replay",
+                        "choices": [],
+                        "usage": usage,
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def load_session(path: str) -> List[Dict[str, Any]]:
+    """Read the comments of a recorded session."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th quantile of values (nearest rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def replay(hub, records: List[Dict[str, Any]], speed: float, timeout: float) -> Dict[str, Any]:
+    """
+    Feed recorded comments to their rooms and wait for them to be processed.
+
+    Args:
+        hub: ModerationHub holding one moderator per recorded room
+        records: Recorded comments
+        speed: Replay speed factor, 0 to replay as fast as possible
+        timeout: Maximum time to wait for pending comments, in seconds
+
+    Returns:
+        Latencies and timings of the replay
+    """
+    latencies = []
+
+    def timed(process_comment):
+        async def timed_process_comment(item):
+            await process_comment(item)
+            latencies.append(time.perf_counter() - item["received"])
+        return timed_process_comment
+
+    for moderator in hub.rooms.values():
+        moderator._process_comment = timed(moderator._process_comment)
+        moderator.is_first_comment = False
+    default_room = next(iter(hub.rooms.values()))
+
+    start = time.perf_counter()
+    first_offset = records[0]["t"] if records else 0
+    for record in records:
+        if speed > 0:
+            delay = start + (record["t"] - first_offset) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        event = types.SimpleNamespace(
+            user=types.SimpleNamespace(
+                nickname=record["nickname"],
+                unique_id=record.get("unique_id"),
+                id=record.get("user_id"),
+            ),
+            comment=record["comment"],
+        )
+        moderator = hub.rooms.get(record.get("room") or "", default_room)
+        await moderator.on_comment(event)
+        if speed == 0:
+            # Let workers run between comments, as network reads would
+            await asyncio.sleep(0)
+    fed = time.perf_counter()
+
+    pipeline = hub.pipeline
+    deadline = time.perf_counter() + timeout
+    while pipeline is not None and time.perf_counter() < deadline:
+        settled = len(latencies) + pipeline.dropped + pipeline.coalesced
+        if settled >= len(records):
+            break
+        await asyncio.sleep(0.01)
+    if pipeline is not None:
+        await pipeline.stop()
+    while time.perf_counter() < deadline:
+        if all(moderator.replies.idle() for moderator in hub.rooms.values()):
+            break
+        await asyncio.sleep(0.01)
+
+    return {
+        "latencies": latencies,
+        "feed_time": fed - start,
+        "total_time": time.perf_counter() - start,
+    }
+
+
+def print_report(result: Dict[str, Any], records: List[Dict[str, Any]], server: FakeOpenAIServer, hub, memory: Dict[str, int]) -> None:
+    """Print the benchmark report."""
+    latencies = [latency * 1000 for latency in result["latencies"]]
+    count = len(records)
+    calls = server.calls["moderations"] + server.calls["chat"]
+    print("\n=== Replay report ===")
+    print(f"Comments: {count} fed in {result['feed_time']:.2f}s, processed {len(latencies)} in {result['total_time']:.2f}s")
+    print(f"Throughput: {len(latencies) / result['total_time']:.1f} comments/s" if result["total_time"] else "Throughput: n/a")
+    print(
+        f"End-to-end latency: p50 {percentile(latencies, 0.50):.1f} ms, "
+        f"p95 {percentile(latencies, 0.95):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms"
+    )
+    print(
+        f"API calls: {server.calls['moderations']} moderation, {server.calls['chat']} chat, "
+        f"{server.calls['errors']} errors ({calls / count if count else 0:.3f} calls/comment)"
+    )
+    if hub.pipeline is not None:
+        print(f"Backpressure: {hub.pipeline.dropped} dropped, {hub.pipeline.coalesced} coalesced, {hub.pipeline.spilled} spilled")
+    print(f"Memory: +{memory['growth'] / 1024:.0f} KiB after replay, peak {memory['peak'] / 1024:.0f} KiB")
+
+
+def parse_arguments() -> Tuple[argparse.Namespace, List[str]]:
+    """Parse command line arguments, returning the ones meant for the moderator separately."""
+    argv = sys.argv[1:]
+    moderator_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, moderator_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded TikTok live session through the moderator",
+        epilog="Arguments after -- are passed to moderator_cool.py (e.g. -- --workers 8)"
+    )
+    parser.add_argument('session', type=str, help='JSONL file recorded with moderator_cool.py --record')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed factor, 0 for as fast as possible (default: 1)')
+    parser.add_argument('--latency-ms', type=float, default=100, help='Latency of the fake OpenAI API, in ms (default: 100)')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Maximum random extra latency, in ms (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API requests failing with a 500 error (default: 0)')
+    parser.add_argument('--flag-rate', type=float, default=0.05, help='Share of comments flagged by the fake moderation API (default: 0.05)')
+    parser.add_argument('--timeout', type=float, default=60, help='Maximum time to wait for pending comments, in seconds (default: 60)')
+    return parser.parse_args(argv), moderator_args
+
+
+def main() -> None:
+    """Main entry point for the script."""
+    args, moderator_args = parse_arguments()
+    records = load_session(args.session)
+
+    server = FakeOpenAIServer(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        flag_rate=args.flag_rate
+    )
+    server.start()
+
+    # The OpenAI client reads its configuration when it is first used
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "replay"
+
+    # One room per channel found in the recording
+    channels = []
+    for record in records:
+        if record.get("room") and record["room"] not in channels:
+            channels.append(record["room"])
+    channel_args = [arg for channel in channels or ["replay"] for arg in ("--channel", channel)]
+    moderator_options = tiktok_moderator.parse_arguments([*channel_args, *moderator_args])
+    moderator_options.dry_run = True
+    moderator_options.record = None
+
+    tracemalloc.start()
+    hub = tiktok_moderator.create_hub(moderator_options)
+    hub.warm_up()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = asyncio.run(replay(hub, records, args.speed, args.timeout))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    server.stop()
+    if hub.events is not None:
+        hub.events.close()
+
+    hub.print_stats()
+    print_report(result, records, server, hub, {"growth": current - baseline, "peak": peak})
+
+
+if __name__ == '__main__':
+    main()
@@ -822,6 +822,21 @@ app.post('/api/users/undesirables', async (req, res) => {
     }
 });
 
+// Alerts and replies posted by moderator_cool.py (--output webhook:URL)
+app.post('/api/moderator/events', (req, res) => {
+    try {
+        const { lane, text } = req.body;
+        if (!lane || !text) {
+            return res.status(400).json({ error: 'lane and text are required' });
+        }
+        io.emit('moderatorEvent', req.body);
+        res.json({ success: true });
+    } catch (error) {
+        console.error('Error forwarding moderator event:', error);
+        res.status(500).json({ error: 'Failed to forward moderator event' });
+    }
+});
+
 app.delete('/api/users/friends/:uniqueId', async (req, res) => {
     try {
         const { uniqueId } = req.params;
@@ -0,0 +1,206 @@
+"""Tests of the rate limits, retries and circuit breaker of the API endpoints."""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_moderator.api import ApiEndpoint, CircuitBreaker, CircuitOpenError, TokenBucket  # noqa: E402
+
+try:
+    import openai
+except ImportError:  # The retry delays need the OpenAI errors
+    openai = None
+
+
+class Clock:
+    """Stand-in for the time module, moved by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/moderations")
+    response = httpx.Response(status, headers=headers, request=request)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat"))
+
+
+class ClockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("tiktok_moderator.api.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TokenBucketTest(ClockTestCase):
+    def test_refills_at_rate_up_to_burst(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        for _ in range(3):
+            self.assertEqual(bucket.delay(), 0)
+            bucket.take()
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(bucket.delay(), 0)
+        self.clock.now += 60
+        self.assertAlmostEqual(bucket.delay(4), 0)  # Capped to the burst
+        bucket.take(3)
+        self.assertAlmostEqual(bucket.delay(2), 1.0)
+
+
+class CircuitBreakerTest(ClockTestCase):
+    def open_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.failure()
+        self.assertFalse(breaker.is_open)
+        breaker.failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+        self.clock.now += 30
+        return breaker
+
+    def test_single_trial_after_reset_timeout(self):
+        breaker = self.open_breaker()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        breaker = self.open_breaker()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+
+    def test_cancelled_trial_lets_another_through(self):
+        breaker = self.open_breaker()
+        endpoint = ApiEndpoint("test", breaker=breaker)
+
+        async def main():
+            started = asyncio.Event()
+
+            async def hang():
+                started.set()
+                await asyncio.sleep(3600)
+
+            trial = asyncio.create_task(endpoint.call(hang))
+            await started.wait()
+            trial.cancel()
+            await asyncio.wait([trial])
+
+            async def answer():
+                return "ok"
+
+            return await endpoint.call(answer)
+
+        self.assertEqual(asyncio.run(main()), "ok")
+        self.assertFalse(breaker.is_open)
+
+
+@unittest.skipIf(openai is None, "openai is not installed")
+class RetryTest(unittest.TestCase):
+    def test_retry_after_headers(self):
+        endpoint = ApiEndpoint("test")
+        self.assertEqual(endpoint._retry_delay(status_error(429, {"retry-after": "2"}), 0), 2.0)
+        self.assertEqual(endpoint._retry_delay(status_error(503, {"retry-after-ms": "250"}), 0), 0.25)
+
+    def test_backoff_with_jitter(self):
+        endpoint = ApiEndpoint("test", base_delay=0.5, max_delay=3)
+        for attempt, ceiling in ((0, 0.5), (2, 2.0), (5, 3.0)):
+            delay = endpoint._retry_delay(connection_error(), attempt)
+            self.assertTrue(0 <= delay <= ceiling)
+        # An HTTP date falls back to the backoff
+        delay = endpoint._retry_delay(status_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0)
+        self.assertTrue(0 <= delay <= 0.5)
+
+    def test_permanent_errors_are_not_retried(self):
+        endpoint = ApiEndpoint("test")
+        self.assertIsNone(endpoint._retry_delay(status_error(400), 0))
+        self.assertIsNone(endpoint._retry_delay(ValueError("bad"), 0))
+
+    def test_call_retries_then_counts_the_failure(self):
+        endpoint = ApiEndpoint("test", max_retries=2, base_delay=0)
+        calls = []
+
+        async def request():
+            calls.append(1)
+            raise connection_error()
+
+        with self.assertRaises(openai.APIConnectionError):
+            asyncio.run(endpoint.call(request))
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(endpoint.breaker.failures, 1)
+
+
+class StreamTest(unittest.TestCase):
+    @staticmethod
+    def read(endpoint, streams):
+        """Read a stream from the endpoint, each request getting the next of streams."""
+        streams = iter(streams)
+
+        async def request():
+            return next(streams)()
+
+        async def main():
+            chunks = []
+            try:
+                async for chunk in endpoint.stream(request):
+                    chunks.append(chunk)
+            except Exception as e:
+                return chunks, e
+            return chunks, None
+
+        return asyncio.run(main())
+
+    @staticmethod
+    def chunks(*items):
+        async def stream():
+            for item in items:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        return stream
+
+    def test_complete_stream_succeeds(self):
+        endpoint = ApiEndpoint("test")
+        endpoint.breaker.failures = 2
+        chunks, error = self.read(endpoint, [self.chunks("a", "b")])
+        self.assertEqual((chunks, error), (["a", "b"], None))
+        self.assertEqual(endpoint.breaker.failures, 0)
+
+    def test_broken_stream_counts_as_failure(self):
+        endpoint = ApiEndpoint("test", breaker=CircuitBreaker(failure_threshold=2))
+        for _ in range(2):
+            chunks, error = self.read(endpoint, [self.chunks("a", ConnectionResetError("reset"))])
+            self.assertEqual(chunks, ["a"])
+            self.assertIsInstance(error, ConnectionResetError)
+        self.assertTrue(endpoint.breaker.is_open)
+        chunks, error = self.read(endpoint, [self.chunks("a")])
+        self.assertIsInstance(error, CircuitOpenError)
+
+    @unittest.skipIf(openai is None, "openai is not installed")
+    def test_stream_broken_before_its_first_chunk_is_retried(self):
+        endpoint = ApiEndpoint("test", base_delay=0)
+        chunks, error = self.read(endpoint, [self.chunks(connection_error()), self.chunks("a", "b")])
+        self.assertEqual((chunks, error), (["a", "b"], None))
+        self.assertEqual(endpoint.breaker.failures, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+"""Tests of the chat completion backends."""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_moderator import ChatBackend  # noqa: E402
+
+
+class BackendTest(unittest.TestCase):
+    def create_client(self, backend, environ):
+        with mock.patch.dict(os.environ, environ, clear=True), \
+                mock.patch("tiktok_moderator.chat.create_client") as create_client:
+            chat = ChatBackend(backend)
+            chat.client
+        return chat, create_client.call_args.kwargs
+
+    def test_ollama_host_without_scheme(self):
+        chat, _ = self.create_client("ollama", {"OLLAMA_HOST": "0.0.0.0"})
+        self.assertEqual(chat.base_url, "http://0.0.0.0:11434/v1")
+        chat, _ = self.create_client("ollama", {"OLLAMA_HOST": "http://host.docker.internal:11434/"})
+        self.assertEqual(chat.base_url, "http://host.docker.internal:11434/v1")
+
+    def test_openai_key_stays_with_openai(self):
+        _, options = self.create_client("ollama", {"OPENAI_API_KEY": "sk-secret"})
+        self.assertEqual(options["api_key"], "ollama")
+        _, options = self.create_client("llamacpp", {"OPENAI_API_KEY": "sk-secret", "LLM_API_KEY": "local"})
+        self.assertEqual(options["api_key"], "local")
+
+
+if __name__ == "__main__":
+    unittest.main()
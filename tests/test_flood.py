@@ -0,0 +1,161 @@
+"""Tests of the flood and raid detector."""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_moderator import FloodDetector, OffenderRegistry  # noqa: E402
+
+SPAM = "Abonnez vous à ma chaîne svp"
+
+
+def flip(fingerprint, bits):
+    """Flip the given bits of a fingerprint."""
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+class UserFloodTest(unittest.TestCase):
+    def test_flood_is_reported_once(self):
+        detector = FloodDetector(window=10, user_messages=6, duplicates=0, raid_factor=0)
+        results = [detector.check("@room", "bob", f"message {index}", "Bob", now=index) for index in range(8)]
+        self.assertEqual(results[:5], [None] * 5)
+        self.assertEqual(results[5]["flooding"], "user")
+        self.assertEqual(results[5]["offenders"], [("bob", "Bob")])
+        self.assertEqual(len(results[5]["alerts"]), 1)
+        # Still flooding, without a new alert
+        self.assertEqual(results[7]["flooding"], "user")
+        self.assertEqual(results[7]["alerts"], [])
+        self.assertEqual(detector.stats["user"], 1)
+
+    def test_slow_users_do_not_flood(self):
+        detector = FloodDetector(window=10, user_messages=6, duplicates=0, raid_factor=0)
+        results = [detector.check("@room", "bob", f"message {index}", now=index * 2.5) for index in range(10)]
+        self.assertEqual(results, [None] * 10)
+
+
+class NearDuplicateTest(unittest.TestCase):
+    def detector(self, **options):
+        return FloodDetector(**{"window": 10, "user_messages": 0, "duplicates": 3, "raid_factor": 0, **options})
+
+    def test_decorated_copies_share_a_cluster(self):
+        detector = self.detector()
+        texts = [SPAM, "ABONNEZ VOUS À MA CHAÎNE SVP !!", "abonnez-vous a ma chaine svp"]
+        results = [detector.check("@room", f"user{index}", text, now=index) for index, text in enumerate(texts)]
+        self.assertEqual(results[:2], [None, None])
+        self.assertEqual(results[2]["flooding"], "duplicate")
+        self.assertEqual(len(detector._clusters), 1)
+
+    def test_fingerprints_within_max_distance_share_a_cluster(self):
+        base = 0x0123456789ABCDEF
+        # Seven bits flipped leave at least one of the eight bands intact
+        fingerprints = {"a" * 12: base, "b" * 12: flip(base, range(0, 56, 8))}
+        detector = self.detector()
+        with mock.patch("tiktok_moderator.flood.simhash", fingerprints.get):
+            detector.check("@room", "bob", "a" * 12, now=0)
+            detector.check("@room", "alice", "b" * 12, now=1)
+        self.assertEqual(len(detector._clusters), 1)
+
+    def test_fingerprints_beyond_max_distance_do_not(self):
+        base = 0x0123456789ABCDEF
+        fingerprints = {
+            "a" * 12: base,
+            # One bit in every band: no band is shared
+            "b" * 12: flip(base, range(0, 64, 8)),
+            # Eight bits in one band: the other bands are shared, but too far
+            "c" * 12: flip(base, range(8)),
+        }
+        detector = self.detector()
+        with mock.patch("tiktok_moderator.flood.simhash", fingerprints.get):
+            for index, text in enumerate(fingerprints):
+                detector.check("@room", f"user{index}", text, now=index)
+        self.assertEqual(len(detector._clusters), 3)
+
+    def test_exact_repeats_are_flagged(self):
+        detector = self.detector()
+        for index in range(3):
+            detector.check("@room", f"user{index}", SPAM, now=index)
+        repeat = detector.check("@room", "carol", SPAM.upper(), now=3)
+        # A variant close enough to join the cluster
+        with mock.patch("tiktok_moderator.flood.simhash", return_value=detector._clusters[0]["fingerprint"]):
+            variant = detector.check("@room", "dave", SPAM + " sale idiot", now=4)
+        self.assertEqual((repeat["flooding"], repeat["repeat"]), ("duplicate", True))
+        self.assertEqual((variant["flooding"], variant["repeat"]), ("duplicate", False))
+        self.assertEqual(repeat["alerts"], [])
+        self.assertEqual(detector.stats["repeat"], 1)
+
+    def test_only_repeat_posters_are_offenders(self):
+        detector = self.detector()
+        detector.check("@room", "bob", SPAM, "Bob", now=0)
+        detector.check("@room", "bob", SPAM, "Bob", now=1)
+        flood = detector.check("@room", "alice", SPAM, "Alice", now=2)
+        self.assertEqual(flood["offenders"], [("bob", "Bob")])
+        self.assertEqual(detector.check("@room", "carol", SPAM, now=3)["offenders"], [])
+        self.assertEqual(detector.check("@room", "carol", SPAM, now=4)["offenders"], [("carol", "carol")])
+
+    def test_new_wave_starts_over(self):
+        detector = self.detector()
+        for index in range(3):
+            detector.check("@room", f"user{index}", SPAM, now=index)
+        # Quiet for longer than the window
+        self.assertIsNone(detector.check("@room", "user3", SPAM, now=20))
+        self.assertIsNone(detector.check("@room", "user4", SPAM, now=21))
+        flood = detector.check("@room", "user5", SPAM, now=22)
+        self.assertEqual(len(flood["alerts"]), 1)
+
+    def test_rooms_are_apart(self):
+        detector = self.detector()
+        for index in range(3):
+            self.assertIsNone(detector.check(f"@room{index}", f"user{index}", SPAM, now=index))
+
+    def test_evicted_clusters_leave_the_band_index(self):
+        detector = self.detector(max_clusters=2)
+        texts = ["premier commentaire du live", "une toute autre question", "encore un autre sujet ici"]
+        for index, text in enumerate(texts):
+            detector.check("@room", "bob", text, now=index)
+        self.assertEqual(len(detector._clusters), 2)
+        indexed = set(detector._bands.values())
+        self.assertEqual(indexed, set(detector._clusters))
+
+
+class RaidTest(unittest.TestCase):
+    def detector(self):
+        return FloodDetector(window=10, user_messages=0, duplicates=0, raid_factor=4, raid_min_comments=30)
+
+    def test_burst_over_the_usual_rate_is_a_raid(self):
+        detector = self.detector()
+        for second in range(70):
+            self.assertIsNone(detector.check("@room", f"user{second}", "salut", now=second))
+        alerts = []
+        for index in range(40):
+            result = detector.check("@room", f"raider{index}", "salut", now=70.5)
+            if result is not None:
+                alerts += result["alerts"]
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0][0], "Raid détecté!")
+        self.assertEqual(detector.stats["raid"], 1)
+
+    def test_no_raid_before_the_usual_rate_is_known(self):
+        detector = self.detector()
+        results = [detector.check("@room", f"raider{index}", "salut", now=5) for index in range(40)]
+        self.assertEqual(results, [None] * 40)
+
+
+class FloodOffenderTest(unittest.TestCase):
+    def test_floods_stay_out_of_the_count(self):
+        registry = OffenderRegistry()
+        for _ in range(5):
+            registry.record_flood("bob", SPAM, nickname="Bob")
+        self.assertEqual(registry.count("bob"), 0)
+        self.assertEqual(registry.floods("bob"), 5)
+        self.assertGreater(registry.score("bob"), 0)
+        registry.record("bob", "tu es un idiot", {"harassment": 0.9})
+        self.assertEqual(registry.count("bob"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
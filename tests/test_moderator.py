@@ -0,0 +1,164 @@
+"""Smoke tests of the tiktok_moderator package, without network or GUI."""
+
+import asyncio
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import types
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tiktok_moderator import (  # noqa: E402
+    ChatBackend, ModerationEngine, ModerationHub, OutputQueue, StdoutSink, TikTokModerator,
+    make_moderation_result
+)
+
+
+class StubEngine(ModerationEngine):
+    """Flags the comments containing "idiot"."""
+
+    name = "stub"
+
+    def __init__(self):
+        self.calls = []
+
+    async def moderate(self, comment_texts):
+        self.calls.append(list(comment_texts))
+        return [
+            make_moderation_result({"harassment": 0.9} if "idiot" in text else {})
+            for text in comment_texts
+        ]
+
+
+class StubChat(ChatBackend):
+    """Answers every prompt with the same pieces of text."""
+
+    def __init__(self, pieces, stream=True):
+        super().__init__(stream=stream)
+        self.pieces = pieces
+
+    async def complete(self, system_prompt, user_prompt, room="", stage="chat"):
+        return "".join(self.pieces)
+
+    async def stream(self, system_prompt, user_prompt, room="", stage="chat"):
+        if not self.streaming:
+            yield await self.complete(system_prompt, user_prompt, room, stage)
+            return
+        for piece in self.pieces:
+            yield piece
+
+
+class ListSink:
+    """Keeps the text of the replies."""
+
+    lanes = {"reply"}
+
+    def __init__(self):
+        self.texts = []
+
+    def send(self, message):
+        self.texts.append(message["text"])
+
+
+def comment_event(nickname, comment, unique_id=None):
+    """Build an object shaped like a TikTokLive CommentEvent."""
+    user = types.SimpleNamespace(nickname=nickname, unique_id=unique_id or nickname.lower(), id=42)
+    return types.SimpleNamespace(user=user, comment=comment)
+
+
+class ImportTest(unittest.TestCase):
+    def test_import_has_no_side_effects(self):
+        optional = ["openai", "TikTokLive", "pync", "pyautogui", "pyperclip", "numpy", "tiktoken"]
+        output = subprocess.run(
+            [
+                sys.executable, "-c",
+                "import sys, tiktok_moderator; "
+                f"print([name for name in {optional!r} if name in sys.modules])"
+            ],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), "[]")
+
+
+class OnCommentTest(unittest.TestCase):
+    def run_comments(self, comments):
+        engine = StubEngine()
+        hub = ModerationHub(
+            workers=0,
+            batch_window_ms=0,
+            moderation_engine=engine,
+            output=OutputQueue([StdoutSink()])
+        )
+        room = TikTokModerator("test", hub=hub, client=object())
+
+        async def feed():
+            for comment in comments:
+                await room.on_comment(comment_event(*comment))
+
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            asyncio.run(feed())
+            hub.output.close()
+        return hub, engine, stdout.getvalue()
+
+    def test_flagged_comment_is_reported(self):
+        hub, engine, stdout = self.run_comments([
+            ("First", "skipped on connection"),
+            ("Bob", "tu es un idiot"),
+            ("Alice", "super live ce soir"),
+        ])
+        self.assertEqual(sum(len(batch) for batch in engine.calls), 2)
+        self.assertEqual(hub.offenders.count("bob"), 1)
+        self.assertEqual(hub.offenders.count("alice"), 0)
+        self.assertIn("[ALERT] Message problématique détecté!: Bob: tu es un idiot", stdout)
+
+    def test_greetings_skip_the_engine(self):
+        _, engine, _ = self.run_comments([
+            ("First", "skipped on connection"),
+            ("Bob", "bonjour à tous"),
+            ("Alice", "❤️❤️"),
+        ])
+        self.assertEqual(engine.calls, [])
+
+    def test_repeats_are_remembered_per_viewer(self):
+        hub, _, _ = self.run_comments([
+            ("First", "skipped on connection"),
+            ("Alice", "super live ce soir", "alice1"),
+            ("Alice", "super live ce soir", "alice2"),
+            ("Alice", "super live ce soir", "alice1"),
+        ])
+        self.assertEqual(hub.prefilter.stats["repeat"], 1)
+
+
+class ReplyNumberingTest(unittest.TestCase):
+    def post_reply(self, pieces, stream=True):
+        sink = ListSink()
+        hub = ModerationHub(
+            workers=0,
+            chat=StubChat(pieces, stream=stream),
+            output=OutputQueue([sink], rate=1000, burst=100)
+        )
+        room = TikTokModerator("test", hub=hub, client=object())
+        asyncio.run(room._generate_response([{"username": "Bob", "message": "ça va ?"}], []))
+        hub.output.close()
+        return sink.texts
+
+    def test_last_word_overflowing_keeps_the_total(self):
+        texts = self.post_reply(["a" * 90 + " ", "b" * 10])
+        self.assertEqual(texts, ["a" * 90 + "1/2", "b" * 10 + "2/2"])
+
+    def test_streamed_chunks_are_numbered_as_they_come(self):
+        texts = self.post_reply(["a" * 60 + " ", "b" * 60 + " ", "c" * 60])
+        self.assertEqual(texts, ["a" * 60 + "1/…", "b" * 60 + "2/3", "c" * 60 + "3/3"])
+
+    def test_complete_replies_have_exact_totals(self):
+        texts = self.post_reply(["a" * 60 + " ", "b" * 60 + " ", "c" * 60], stream=False)
+        self.assertEqual(texts, ["a" * 60 + "1/3", "b" * 60 + "2/3", "c" * 60 + "3/3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Tests of the offender registry and its undesirables table."""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_moderator import OffenderRegistry  # noqa: E402
+
+# Tables created by db.js
+SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    userId TEXT UNIQUE NOT NULL,
+    uniqueId TEXT UNIQUE NOT NULL,
+    nickname TEXT NOT NULL,
+    profilePictureUrl TEXT,
+    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE friends (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uniqueId TEXT UNIQUE NOT NULL,
+    user_id INTEGER NOT NULL,
+    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE undesirables (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uniqueId TEXT UNIQUE NOT NULL,
+    user_id INTEGER NOT NULL,
+    reason TEXT,
+    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+class SaveTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = os.path.join(directory.name, "tiktok.db")
+        db = sqlite3.connect(self.db_path)
+        db.executescript(SCHEMA)
+        db.execute("INSERT INTO users (userId, uniqueId, nickname) VALUES ('1', 'alice', 'Alice')")
+        db.execute("INSERT INTO friends (uniqueId, user_id) VALUES ('alice', 1)")
+        db.commit()
+        db.close()
+
+    def undesirables(self):
+        db = sqlite3.connect(self.db_path)
+        try:
+            return [row[0] for row in db.execute("SELECT uniqueId FROM undesirables ORDER BY uniqueId")]
+        finally:
+            db.close()
+
+    def test_repeat_offenders_are_saved(self):
+        registry = OffenderRegistry()
+        for _ in range(3):
+            registry.record("bob", "tu es un idiot", {"harassment": 0.9}, nickname="Bob")
+        registry.record("carol", "idiot", {"harassment": 0.9})
+        self.assertEqual(registry.save(self.db_path), 1)
+        self.assertEqual(self.undesirables(), ["bob"])
+
+        loaded = OffenderRegistry()
+        self.assertEqual(loaded.load(self.db_path), 1)
+        self.assertEqual(loaded.announce("bob"), "Modération: harassment x3")
+
+    def test_friends_are_not_saved(self):
+        registry = OffenderRegistry()
+        for _ in range(3):
+            registry.record("alice", "tu es un idiot", {"harassment": 0.9}, nickname="Alice")
+        self.assertEqual(registry.save(self.db_path), 0)
+        self.assertEqual(self.undesirables(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
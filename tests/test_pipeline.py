@@ -0,0 +1,126 @@
+"""Tests of the comment worker pool."""
+
+import asyncio
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_moderator import (  # noqa: E402
+    ModerationEngine, ModerationHub, OutputQueue, TikTokModerator, make_moderation_result
+)
+from tiktok_moderator.pipeline import CommentPipeline  # noqa: E402
+
+
+class CountingEngine(ModerationEngine):
+    """Accepts every comment, keeping the texts it was sent."""
+
+    name = "counting"
+
+    def __init__(self):
+        self.texts = []
+
+    async def moderate(self, comment_texts):
+        self.texts += comment_texts
+        return [make_moderation_result({}) for _ in comment_texts]
+
+
+def comment_event(nickname, comment):
+    """Build an object shaped like a TikTokLive CommentEvent."""
+    user = types.SimpleNamespace(nickname=nickname, unique_id=nickname.lower(), id=42)
+    return types.SimpleNamespace(user=user, comment=comment)
+
+
+class BackpressureTest(unittest.TestCase):
+    COMMENTS = ["premier message du live", "deuxième message du live", "troisième message du live"]
+
+    def moderated_texts(self, policy):
+        engine = CountingEngine()
+
+        async def main():
+            hub = ModerationHub(
+                workers=1,
+                queue_size=1,
+                backpressure=policy,
+                batch_window_ms=0,
+                moderation_engine=engine,
+                output=OutputQueue([])
+            )
+            room = TikTokModerator("test", hub=hub, client=object())
+            room.is_first_comment = False
+            # Submitted back to back, before the worker takes the first one
+            for comment in self.COMMENTS:
+                await room.on_comment(comment_event("Bob", comment))
+            while hub.pipeline.pending():
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            await hub.pipeline.stop()
+            hub.output.close()
+
+        asyncio.run(main())
+        return engine.texts
+
+    def test_dropped_comments_are_not_moderated(self):
+        self.assertEqual(self.moderated_texts("drop"), self.COMMENTS[:1])
+
+    def test_coalesced_comments_are_moderated_once_merged(self):
+        self.assertEqual(self.moderated_texts("coalesce"), [self.COMMENTS[0], "\n".join(self.COMMENTS)])
+
+    def test_same_nickname_is_not_coalesced(self):
+        async def main():
+            async def handler(item):
+                pass
+
+            pipeline = CommentPipeline(handler, workers=1, queue_size=1, policy="coalesce")
+            first = {"username": "Bob", "unique_id": "bob1", "message": "a"}
+            queued = [
+                pipeline.submit(first),
+                pipeline.submit({"username": "Bob", "unique_id": "bob2", "message": "b"}),
+                pipeline.submit({"username": "Bob", "unique_id": "bob1", "message": "c"}),
+            ]
+            await pipeline.stop()
+            return queued, first["message"]
+
+        queued, message = asyncio.run(main())
+        self.assertEqual([item is not None for item in queued], [True, False, True])
+        self.assertEqual(message, "a\nc")
+
+
+class CancellationTest(unittest.TestCase):
+    def test_busy_worker_stops_when_cancelled(self):
+        async def main():
+            started = asyncio.Event()
+
+            async def handler(item):
+                started.set()
+                await asyncio.sleep(3600)
+
+            pipeline = CommentPipeline(handler, workers=1)
+            pipeline.submit({"username": "bob", "message": "salut"})
+            await started.wait()
+            worker = pipeline._tasks[0]
+            # What asyncio.run does to the tasks left when main() returns
+            worker.cancel()
+            await asyncio.wait([worker], timeout=1)
+            return worker.done()
+
+        self.assertTrue(asyncio.run(main()))
+
+    def test_cancelled_comment_keeps_shared_verdict(self):
+        async def main():
+            hub = ModerationHub(workers=0, output=OutputQueue([]))
+            room = TikTokModerator("test", hub=hub, client=types.SimpleNamespace())
+            verdict = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(room._check_comment_moderation("bob", "salut", verdict))
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.wait([task], timeout=1)
+            return task.cancelled(), verdict.cancelled()
+
+        self.assertEqual(asyncio.run(main()), (True, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
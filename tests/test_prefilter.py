@@ -0,0 +1,32 @@
+"""Tests of the local moderation pre-filter."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_moderator import CommentPreFilter  # noqa: E402
+
+
+class PreFilterTest(unittest.TestCase):
+    def test_blocklist_flags_locally(self):
+        prefilter = CommentPreFilter(["idiot"])
+        self.assertTrue(prefilter.check("bob", "Quel IDIOT").flagged)
+
+    def test_greetings_and_emoji_are_accepted(self):
+        prefilter = CommentPreFilter()
+        self.assertFalse(prefilter.check("bob", "bonjour à tous").flagged)
+        self.assertFalse(prefilter.check("bob", "❤️❤️").flagged)
+        self.assertIsNone(prefilter.check("bob", "tu joues à quoi ?"))
+
+    def test_repeats_are_remembered_per_unique_id(self):
+        prefilter = CommentPreFilter()
+        prefilter.remember("alice1", "Tu joues à quoi ?")
+        self.assertIsNotNone(prefilter.check("alice1", "tu joues à quoi ?"))
+        # Another viewer using the same nickname
+        self.assertIsNone(prefilter.check("alice2", "tu joues à quoi ?"))
+
+
+if __name__ == "__main__":
+    unittest.main()
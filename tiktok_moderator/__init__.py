@@ -0,0 +1,35 @@
+"""
+TikTok live chat moderation library.
+
+Moderates the comments of TikTok lives with the OpenAI moderation API or a
+local classifier, notifies the host of problematic messages and answers
+the chat. Used by moderator.py and moderator_cool.py.
+
+Importing the package has no side effects: the OpenAI client is created on
+first use, and TikTokLive, pync, pyperclip and pyautogui are only imported
+by the components that need them.
+"""
+
+from .api import ApiEndpoint, CircuitBreaker, CircuitOpenError, TokenBucket, get_client
+from .budget import TokenBudget
+from .chat import ChatBackend, ReplyChunker
+from .classifier import LocalClassifier
+from .cli import create_hub, main, parse_arguments
+from .flood import FloodDetector, simhash
+from .history import CommentHistory, count_tokens
+from .hub import ModerationHub
+from .metrics import Metrics, metrics
+from .moderation import LocalModerationEngine, ModerationBatcher, ModerationEngine, OpenAIModerationEngine
+from .moderator import TikTokModerator
+from .offenders import OffenderRegistry
+from .output import (
+    FileSink, NotificationSink, OutputQueue, StdoutSink, TyperSink, WebhookSink,
+    create_sink, default_sinks,
+)
+from .pipeline import CommentPipeline, ReplyScheduler
+from .prefilter import AhoCorasick, CommentPreFilter
+from .prompts import SYSTEM_PROMPT_HOST_READER, SYSTEM_PROMPT_READER, SYSTEM_PROMPT_RESPONDER
+from .routing import DEFAULT_ROUTES, TriggerRouter
+from .similarity import HashedVectorizer, ReplyCache
+from .storage import CommentRecorder, EventStore
+from .verdicts import VerdictCache, make_moderation_result
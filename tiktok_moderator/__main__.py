@@ -0,0 +1,6 @@
+"""Run the moderator with `python -m tiktok_moderator`, same options as moderator_cool.py."""
+
+from .cli import main
+
+if __name__ == '__main__':
+    main()
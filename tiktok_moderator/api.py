@@ -0,0 +1,292 @@
+"""OpenAI client shared by the moderator, with rate limits, retries and circuit breaking.
+
+The client is created on first use, so importing the package needs
+neither network access nor an API key.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Optional, Callable, Awaitable, AsyncIterator
+
+import httpx
+
+from .metrics import metrics
+
+# Keep-alive connections shared by all API calls, retries are made by ApiEndpoint
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+MODERATION_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+CHAT_TIMEOUT = httpx.Timeout(30.0, connect=2.0)
+
+_client = None
+
+
+def create_client(base_url: Optional[str] = None, api_key: Optional[str] = None) -> Any:
+    """Create an AsyncOpenAI client on the shared pool settings, configured from the environment by default."""
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        http_client=DefaultAsyncHttpxClient(limits=HTTP_LIMITS, timeout=CHAT_TIMEOUT),
+        max_retries=0
+    )
+
+
+def get_client() -> Any:
+    """Return the OpenAI client shared by the moderation and chat calls, created on first use."""
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+
+class TokenBucket:
+    """Token bucket limiting how fast messages or API calls are sent."""
+
+    def __init__(self, rate: float, burst: float = 1):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens stored
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def delay(self, amount: float = 1) -> float:
+        """Time to wait for amount tokens, in seconds (0 if they are available)."""
+        amount = min(amount, self.burst)
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return 0.0 if self._tokens >= amount else (amount - self._tokens) / self.rate
+
+    def take(self, amount: float = 1) -> None:
+        """Consume tokens."""
+        self._tokens -= min(amount, self.burst)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint that keeps failing."""
+
+
+class CircuitBreaker:
+    """Stops calling an endpoint after repeated failures.
+
+    After ``failure_threshold`` consecutive failed calls the circuit opens
+    and calls are refused for ``reset_timeout`` seconds. A single trial call
+    is then let through: it closes the circuit if it succeeds, and opens it
+    again otherwise.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Time before a trial call is allowed, in seconds
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a call may be made now."""
+        if self._opened_at is None:
+            return True
+        if self._trial or time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+        self._trial = True
+        return True
+
+    def success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._trial = False
+
+    def abandon(self) -> None:
+        """Let another trial call through after one ended without an outcome (e.g. cancelled)."""
+        self._trial = False
+
+
+class ApiEndpoint:
+    """Rate limiting, retries and circuit breaking for one API endpoint.
+
+    Calls wait for the endpoint's requests-per-minute and tokens-per-minute
+    budgets, so bursts are smoothed instead of answered with 429s.
+    Rate limits, timeouts, connection errors and server errors are retried
+    with exponential backoff and full jitter, or after the delay given by
+    the server's Retry-After header. Calls that still fail, and streams
+    that break once their first chunks were used, count towards the
+    endpoint's circuit breaker.
+    """
+
+    RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Initialize the endpoint.
+
+        Args:
+            name: Endpoint name used in metrics
+            rpm: Requests allowed per minute (unlimited if None)
+            tpm: Tokens allowed per minute (unlimited if None)
+            max_retries: Number of retries of a failed call
+            base_delay: Backoff before the first retry, in seconds
+            max_delay: Maximum backoff, in seconds
+            breaker: Circuit breaker of the endpoint (a default one if None)
+        """
+        self.name = name
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Budgets refill continuously, bursting up to one second of traffic
+        self._requests = TokenBucket(rpm / 60, max(1, rpm / 60)) if rpm else None
+        self._tokens = TokenBucket(tpm / 60, max(1, tpm / 60)) if tpm else None
+        self.breaker = breaker or CircuitBreaker()
+        metrics.gauge(f"{name}_circuit_open", lambda: int(self.breaker.is_open))
+
+    async def _acquire(self, tokens: float) -> None:
+        """Wait for the request and token budgets."""
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is None or not amount:
+                continue
+            delay = bucket.delay(amount)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = bucket.delay(amount)
+            bucket.take(amount)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Time to wait before retrying a failed call, or None if it must not be retried."""
+        from openai import APIConnectionError, APIStatusError
+        if isinstance(error, APIStatusError):
+            if error.status_code not in self.RETRY_STATUSES:
+                return None
+            headers = error.response.headers
+            try:
+                if "retry-after-ms" in headers:
+                    return float(headers["retry-after-ms"]) / 1000
+                if "retry-after" in headers:
+                    return float(headers["retry-after"])
+            except ValueError:
+                pass  # An HTTP date, use the backoff
+        elif not isinstance(error, APIConnectionError):
+            return None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _enter(self) -> bool:
+        """Check the circuit before a call, returning whether it is the circuit's trial call."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        # Calls let through an open circuit are its trial call
+        return self.breaker.is_open
+
+    async def _retry(self, error: Exception, attempt: int) -> bool:
+        """Wait before retrying a failed call, or record the failure and return False."""
+        delay = self._retry_delay(error, attempt) if attempt < self.max_retries else None
+        if delay is None:
+            self.breaker.failure()
+            return False
+        metrics.inc("api_retries_total", endpoint=self.name)
+        await asyncio.sleep(delay)
+        return True
+
+    async def call(self, request: Callable[[], Awaitable[Any]], tokens: float = 0) -> Any:
+        """
+        Make a call, waiting for the rate limits and retrying transient errors.
+
+        Args:
+            request: Function starting the API call
+            tokens: Estimated tokens used by the call
+
+        Returns:
+            The result of the call
+
+        Raises:
+            CircuitOpenError: When the endpoint's circuit is open
+        """
+        trial = self._enter()
+        attempt = 0
+        try:
+            while True:
+                await self._acquire(tokens)
+                try:
+                    result = await request()
+                except Exception as e:
+                    if not await self._retry(e, attempt):
+                        raise
+                    attempt += 1
+                    continue
+                self.breaker.success()
+                return result
+        finally:
+            # A cancelled trial neither closes nor reopens the circuit, and
+            # must not keep every later call out
+            if trial:
+                self.breaker.abandon()
+
+    async def stream(self, request: Callable[[], Awaitable[Any]], tokens: float = 0) -> AsyncIterator[Any]:
+        """
+        Make a streaming call, yielding its chunks as they arrive.
+
+        The call only succeeds once its stream is fully read. Errors while
+        reading it are retried like those of call() until a chunk has been
+        yielded, and are then only counted by the circuit breaker.
+
+        Args:
+            request: Function starting the API call, returning an async iterable
+            tokens: Estimated tokens used by the call
+
+        Raises:
+            CircuitOpenError: When the endpoint's circuit is open
+        """
+        trial = self._enter()
+        attempt = 0
+        try:
+            while True:
+                await self._acquire(tokens)
+                received = False
+                try:
+                    async for chunk in await request():
+                        received = True
+                        yield chunk
+                except Exception as e:
+                    if received:
+                        # The chunks already yielded cannot be taken back
+                        self.breaker.failure()
+                        raise
+                    if not await self._retry(e, attempt):
+                        raise
+                    attempt += 1
+                    continue
+                self.breaker.success()
+                return
+        finally:
+            if trial:
+                self.breaker.abandon()
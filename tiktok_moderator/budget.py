@@ -0,0 +1,168 @@
+"""Token and cost accounting of chat completions, and the budget governor."""
+
+import time
+from collections import deque
+from typing import List, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+class TokenBudget:
+    """Token and cost accounting of chat completions, per room and stage.
+
+    Prompt and completion tokens are counted with the local tokenizer and
+    priced per model. When an hourly or per-stream spending limit is set,
+    replies degrade step by step as the limit approaches: the history sent
+    with prompts shrinks, then a cheaper model is used, then AI replies
+    stop until the hourly spend falls back.
+    """
+
+    # USD per million input, cached input and output tokens; other
+    # models (e.g. local ones) are free
+    PRICES = {
+        "gpt-4o-mini": (0.15, 0.075, 0.60),
+        "gpt-4o": (2.50, 1.25, 10.00),
+        "gpt-4.1-nano": (0.10, 0.025, 0.40),
+        "gpt-4.1-mini": (0.40, 0.10, 1.60),
+        "gpt-4.1": (2.00, 0.50, 8.00),
+    }
+
+    # Degradation levels and the share of the limit from which they apply
+    NORMAL, SHORT_HISTORY, CHEAP_MODEL, NO_REPLIES = range(4)
+    THRESHOLDS = ((1.0, NO_REPLIES), (0.8, CHEAP_MODEL), (0.5, SHORT_HISTORY))
+    DESCRIPTIONS = {
+        NORMAL: "back to normal replies",
+        SHORT_HISTORY: "sending a shorter history",
+        CHEAP_MODEL: "switching to the cheaper model",
+        NO_REPLIES: "AI replies disabled",
+    }
+
+    def __init__(
+        self,
+        hourly_usd: Optional[float] = None,
+        stream_usd: Optional[float] = None,
+        cheap_model: Optional[str] = None
+    ):
+        """
+        Initialize the budget.
+
+        Args:
+            hourly_usd: Spending limit over the last hour, all rooms together (none if None)
+            stream_usd: Spending limit of each room since it started (none if None)
+            cheap_model: Model used when the limit gets close (the configured one if None)
+        """
+        self.hourly_usd = hourly_usd
+        self.stream_usd = stream_usd
+        self.cheap_model = cheap_model
+        # (room, stage, model) -> [calls, prompt, cached, completion, cost]
+        self.usage: Dict[Tuple[str, str, str], List[float]] = {}
+        self.room_spend: Dict[str, float] = {}
+        self._hour: deque = deque()
+        self._hour_spend = 0.0
+        self._levels: Dict[str, int] = {}
+
+    @classmethod
+    def price(cls, model: str) -> Tuple[float, float, float]:
+        """Return the prices of a model, matching dated versions by their longest prefix."""
+        for name in sorted(cls.PRICES, key=len, reverse=True):
+            if model.startswith(name):
+                return cls.PRICES[name]
+        return (0.0, 0.0, 0.0)
+
+    def record(
+        self,
+        room: str,
+        stage: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0
+    ) -> float:
+        """
+        Account for one chat completion.
+
+        Args:
+            room: Channel the completion was made for
+            stage: Kind of completion (e.g. read or reply)
+            model: Model that generated it
+            prompt_tokens: Tokens of the prompt
+            completion_tokens: Tokens of the generated text
+            cached_tokens: Prompt tokens served from the provider's prompt cache
+
+        Returns:
+            Cost of the completion in USD
+        """
+        cached_tokens = min(cached_tokens, prompt_tokens)
+        input_price, cached_price, output_price = self.price(model)
+        cost = (
+            (prompt_tokens - cached_tokens) * input_price
+            + cached_tokens * cached_price
+            + completion_tokens * output_price
+        ) / 1e6
+
+        usage = self.usage.setdefault((room, stage, model), [0, 0, 0, 0, 0.0])
+        usage[0] += 1
+        usage[1] += prompt_tokens
+        usage[2] += cached_tokens
+        usage[3] += completion_tokens
+        usage[4] += cost
+        self.room_spend[room] = self.room_spend.get(room, 0.0) + cost
+        self._hour.append((time.monotonic(), cost))
+        self._hour_spend += cost
+
+        metrics.inc("llm_tokens_total", prompt_tokens - cached_tokens, kind="prompt", stage=stage, room=room)
+        metrics.inc("llm_tokens_total", cached_tokens, kind="cached", stage=stage, room=room)
+        metrics.inc("llm_tokens_total", completion_tokens, kind="completion", stage=stage, room=room)
+        metrics.inc("llm_cost_usd_total", cost, stage=stage, room=room)
+        return cost
+
+    def hourly_spend(self) -> float:
+        """Return the spend of the last hour, all rooms together."""
+        cutoff = time.monotonic() - 3600
+        while self._hour and self._hour[0][0] < cutoff:
+            self._hour_spend -= self._hour.popleft()[1]
+        if not self._hour:
+            self._hour_spend = 0.0
+        return self._hour_spend
+
+    def share(self, room: str) -> float:
+        """Return the highest share of a limit used by a room."""
+        shares = [0.0]
+        if self.hourly_usd:
+            shares.append(self.hourly_spend() / self.hourly_usd)
+        if self.stream_usd:
+            shares.append(self.room_spend.get(room, 0.0) / self.stream_usd)
+        return max(shares)
+
+    def level(self, room: str) -> int:
+        """Return the degradation level of a room, announcing changes."""
+        share = self.share(room)
+        level = next((level for threshold, level in self.THRESHOLDS if share >= threshold), self.NORMAL)
+        if level != self._levels.get(room, self.NORMAL):
+            print(f"[BUDGET] {room}: {share:.0%} of the budget used, {self.DESCRIPTIONS[level]}")
+            metrics.inc("budget_level_changes_total", level=str(level))
+        self._levels[room] = level
+        return level
+
+    def history_tokens(self, room: str, tokens: int) -> int:
+        """Return the token budget of the history sent with a room's prompts."""
+        return tokens // 2 if self.level(room) >= self.SHORT_HISTORY else tokens
+
+    def model(self, room: str, model: str) -> str:
+        """Return the model used for a room's next completion."""
+        if self.cheap_model and self.level(room) >= self.CHEAP_MODEL:
+            return self.cheap_model
+        return model
+
+    def allows_replies(self, room: str) -> bool:
+        """Tell whether AI completions may still be made for a room."""
+        return self.level(room) < self.NO_REPLIES
+
+    def report(self) -> List[str]:
+        """Return one line of token usage and cost per room, stage and model."""
+        lines = []
+        for (room, stage, model), (calls, prompt, cached, completion, cost) in sorted(self.usage.items()):
+            lines.append(
+                f"  {room} {stage} ({model}): {calls} calls, {prompt} prompt tokens "
+                f"({cached} cached), {completion} completion tokens, ${cost:.4f}"
+            )
+        return lines
@@ -0,0 +1,245 @@
+"""Chat completion backends used for AI replies."""
+
+import os
+import time
+import urllib.parse
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+from .api import ApiEndpoint, CHAT_TIMEOUT, create_client, get_client
+from .budget import TokenBudget
+from .history import count_tokens
+from .metrics import metrics
+
+class ChatBackend:
+    """Chat completion backend speaking the OpenAI API.
+
+    Besides OpenAI itself, this targets OpenAI-compatible local servers
+    such as Ollama or the llama.cpp server. With streaming enabled, reply
+    text is yielded as soon as the server produces it. Every completion
+    is accounted for in the token budget, which may also pick a cheaper
+    model for it.
+    """
+
+    # Default base URL and model of each backend, the Ollama URL is read
+    # from OLLAMA_HOST when the backend is created
+    PRESETS = {
+        "openai": (None, "gpt-4o-mini"),
+        "ollama": ("http://localhost:11434/v1", "llama3.2"),
+        "llamacpp": ("http://localhost:8080/v1", "local"),
+    }
+
+    def __init__(
+        self,
+        backend: str = "openai",
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        stream: bool = True,
+        endpoint: Optional[ApiEndpoint] = None,
+        budget: Optional[TokenBudget] = None
+    ):
+        """
+        Initialize the backend.
+
+        Args:
+            backend: One of PRESETS
+            model: Model name, defaults to the backend's preset
+            base_url: Server URL, defaults to the backend's preset
+            stream: Stream completions instead of waiting for the full answer
+            endpoint: Rate limits, retries and circuit breaker of the chat endpoint
+            budget: Token accounting and spending limits (accounting only if None)
+        """
+        if backend not in self.PRESETS:
+            raise ValueError(f"Unknown LLM backend: {backend}")
+        default_url, default_model = self.PRESETS[backend]
+        if backend == "ollama" and os.environ.get("OLLAMA_HOST"):
+            default_url = self._ollama_url(os.environ["OLLAMA_HOST"])
+        self.backend = backend
+        self.model = model or default_model
+        self.streaming = stream
+        self.endpoint = endpoint or ApiEndpoint("chat")
+        self.budget = budget or TokenBudget()
+        self.base_url = base_url or default_url
+        self._client = None
+
+    @staticmethod
+    def _ollama_url(host: str) -> str:
+        """Return the OpenAI-compatible URL of an OLLAMA_HOST such as "0.0.0.0:11434"."""
+        host = host.strip().rstrip("/")
+        # Ollama accepts hosts without a scheme or a port, httpx does not
+        if "://" not in host:
+            host = "http://" + host
+        parts = urllib.parse.urlsplit(host)
+        if parts.port is None:
+            host = urllib.parse.urlunsplit(parts._replace(netloc=f"{parts.netloc}:11434"))
+        return host + "/v1"
+
+    @property
+    def client(self) -> Any:
+        """OpenAI client of the backend, created on first use."""
+        if self._client is None:
+            if self.base_url is None:
+                self._client = get_client()
+            else:
+                # The OpenAI key only goes to OpenAI. Local servers usually
+                # ignore the key, but the client requires one.
+                key_variable = "OPENAI_API_KEY" if self.backend == "openai" else "LLM_API_KEY"
+                self._client = create_client(
+                    base_url=self.base_url,
+                    api_key=os.environ.get(key_variable) or self.backend
+                )
+        return self._client
+
+    def warm_up(self) -> None:
+        """Create the client and load the tokenizer before the first completion."""
+        self.client
+        count_tokens("")
+
+    @staticmethod
+    def _messages(system_prompt: str, user_prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    @staticmethod
+    def _prompt_tokens(messages: List[Dict[str, str]]) -> int:
+        """Count the tokens of a prompt, including the chat format overhead."""
+        return sum(count_tokens(message["content"]) + 4 for message in messages) + 3
+
+    @staticmethod
+    def _cached_tokens(usage: Any) -> int:
+        """Return the prompt tokens the provider served from its prompt cache."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        return getattr(details, "cached_tokens", None) or 0
+
+    def _options(self, stage: str, stream: bool = False) -> Dict[str, Any]:
+        """Return the OpenAI-only options of a completion request."""
+        if self.backend != "openai":
+            return {}
+        # Requests of a stage share their system prompt, so routing them
+        # to the same cache lets the provider reuse the prefix
+        options: Dict[str, Any] = {"prompt_cache_key": f"tiktok-moderator-{stage}"}
+        if stream:
+            options["stream_options"] = {"include_usage": True}
+        return options
+
+    async def complete(self, system_prompt: str, user_prompt: str, room: str = "", stage: str = "chat") -> str:
+        """Return the full answer to a prompt made for a room's stage."""
+        model = self.budget.model(room, self.model)
+        messages = self._messages(system_prompt, user_prompt)
+        prompt_tokens = self._prompt_tokens(messages)
+        metrics.inc("api_calls_total", endpoint="chat")
+        with metrics.time("api_request_seconds", endpoint="chat"):
+            completion = await self.endpoint.call(
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=CHAT_TIMEOUT,
+                    **self._options(stage)
+                ),
+                tokens=prompt_tokens + 200
+            )
+        content = completion.choices[0].message.content or ""
+        self.budget.record(
+            room, stage, model, prompt_tokens, count_tokens(content),
+            self._cached_tokens(getattr(completion, "usage", None))
+        )
+        return content
+
+    async def stream(self, system_prompt: str, user_prompt: str, room: str = "", stage: str = "chat") -> AsyncIterator[str]:
+        """Yield the answer to a prompt made for a room's stage piece by piece, as it is generated."""
+        if not self.streaming:
+            yield await self.complete(system_prompt, user_prompt, room, stage)
+            return
+        model = self.budget.model(room, self.model)
+        messages = self._messages(system_prompt, user_prompt)
+        prompt_tokens = self._prompt_tokens(messages)
+        metrics.inc("api_calls_total", endpoint="chat")
+        start = time.perf_counter()
+        first = True
+        received = False
+        usage = None
+        text = ""
+        try:
+            async for chunk in self.endpoint.stream(
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    timeout=CHAT_TIMEOUT,
+                    **self._options(stage, stream=True)
+                ),
+                tokens=prompt_tokens + 200
+            ):
+                received = True
+                if not chunk.choices:
+                    # The last chunk carries the usage when it was requested
+                    usage = getattr(chunk, "usage", None) or usage
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    if first:
+                        metrics.observe("api_first_token_seconds", time.perf_counter() - start, endpoint="chat")
+                        first = False
+                    text += content
+                    yield content
+        finally:
+            metrics.observe("api_request_seconds", time.perf_counter() - start, endpoint="chat")
+            # Interrupted streams are billed for what was generated
+            if received:
+                self.budget.record(
+                    room, stage, model, prompt_tokens, count_tokens(text),
+                    self._cached_tokens(usage)
+                )
+
+
+class ReplyChunker:
+    """Splits a reply into chat-sized chunks as soon as each one is complete."""
+
+    def __init__(self, max_chars: int = 100):
+        """
+        Initialize the chunker.
+
+        Args:
+            max_chars: Maximum length of a chat message
+        """
+        # Allow space for the numbering (e.g., "1/10") that will be added later
+        # Conservatively allocate 6 characters for this (up to "10/10")
+        self.limit = max_chars - 6
+        self._current = ""
+        self._partial = ""
+
+    def _add(self, word: str) -> List[str]:
+        # Check if adding this word would exceed the limit
+        if not self._current:
+            self._current = word
+        elif len(self._current + " " + word) <= self.limit:
+            self._current += " " + word
+        else:
+            # Current chunk is full, return it and start a new chunk
+            chunk, self._current = self._current, word
+            return [chunk]
+        return []
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text, returning the chunks it completed."""
+        self._partial += text
+        words = self._partial.split()
+        # The last word may continue in the next piece of text
+        if words and not self._partial[-1].isspace():
+            self._partial = words.pop()
+        else:
+            self._partial = ""
+        chunks = []
+        for word in words:
+            chunks += self._add(word)
+        return chunks
+
+    def finish(self) -> List[str]:
+        """Return the remaining chunks once the reply is complete."""
+        chunks = self._add(self._partial) if self._partial else []
+        self._partial = ""
+        if self._current:
+            chunks.append(self._current)
+            self._current = ""
+        return chunks
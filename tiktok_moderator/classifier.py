@@ -0,0 +1,150 @@
+"""Local moderation model, a linear classifier on hashed character n-grams."""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+from .similarity import HashedVectorizer, require_numpy
+from .verdicts import make_moderation_result
+
+class LocalClassifier:
+    """Linear moderation model on hashed character n-grams, run on the CPU.
+
+    One logistic regression per moderation category, trained on verdicts
+    of the moderation API (see benchmark_moderation.py). Texts are kept
+    as sparse n-gram features, so classifying a batch costs a few
+    ``bincount`` calls however large the vocabulary.
+    """
+
+    def __init__(
+        self,
+        categories: List[str],
+        weights: Any,
+        bias: Any,
+        threshold: float = 0.5,
+        vectorizer: Optional[HashedVectorizer] = None
+    ):
+        """
+        Initialize the classifier.
+
+        Args:
+            categories: Moderation categories predicted by the model
+            weights: Array of shape (categories, vectorizer dim)
+            bias: Array of shape (categories,)
+            threshold: Score from which a category is flagged
+            vectorizer: Feature extractor (a default HashedVectorizer if None)
+        """
+        np = require_numpy("local classifier")
+        self.categories = list(categories)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.threshold = threshold
+        self.vectorizer = vectorizer or HashedVectorizer()
+
+    @staticmethod
+    def _sparse(vectorizer: HashedVectorizer, comment_texts: List[str]) -> Tuple[Any, Any, Any]:
+        """Return the row, bucket and value of every non-zero feature of the texts."""
+        np = require_numpy("local classifier")
+        rows, indices, values = [], [], []
+        for row, comment_text in enumerate(comment_texts):
+            text_indices, text_values = vectorizer.features(comment_text)
+            rows.append(np.full(len(text_indices), row, dtype=np.int64))
+            indices.append(text_indices)
+            values.append(text_values)
+        if not comment_texts:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+        return np.concatenate(rows), np.concatenate(indices), np.concatenate(values)
+
+    @staticmethod
+    def _predict(weights: Any, bias: Any, features: Tuple[Any, Any, Any], count: int) -> Any:
+        """Return the scores of count texts, shape (texts, categories)."""
+        np = require_numpy("local classifier")
+        rows, indices, values = features
+        contributions = weights[:, indices] * values
+        logits = np.stack([
+            np.bincount(rows, weights=category, minlength=count) for category in contributions
+        ], axis=1) + bias if len(weights) else np.zeros((count, 0), dtype=np.float32)
+        return 1 / (1 + np.exp(-logits))
+
+    def classify(self, comment_texts: List[str]) -> List[Any]:
+        """Return moderation results shaped like the API's."""
+        features = self._sparse(self.vectorizer, comment_texts)
+        scores = self._predict(self.weights, self.bias, features, len(comment_texts))
+        return [
+            make_moderation_result({
+                category: float(score)
+                for category, score in zip(self.categories, text_scores)
+                if score >= self.threshold
+            })
+            for text_scores in scores
+        ]
+
+    @classmethod
+    def train(
+        cls,
+        comment_texts: List[str],
+        verdicts: List[Dict[str, float]],
+        epochs: int = 200,
+        learning_rate: float = 2.0,
+        l2: float = 1e-5,
+        vectorizer: Optional[HashedVectorizer] = None
+    ) -> "LocalClassifier":
+        """
+        Fit the model with gradient descent on labeled comments.
+
+        Args:
+            comment_texts: Training comments
+            verdicts: Flagged categories and scores of each comment, {} if accepted
+            epochs: Number of passes over the comments
+            learning_rate: Gradient descent step
+            l2: Weight decay
+            vectorizer: Feature extractor (a default HashedVectorizer if None)
+        """
+        np = require_numpy("local classifier")
+        vectorizer = vectorizer or HashedVectorizer()
+        categories = sorted({category for verdict in verdicts for category in verdict})
+        count = len(comment_texts)
+        labels = np.array(
+            [[category in verdict for category in categories] for verdict in verdicts],
+            dtype=np.float32
+        ).reshape(count, len(categories))
+        features = cls._sparse(vectorizer, comment_texts)
+        rows, indices, values = features
+        weights = np.zeros((len(categories), vectorizer.dim), dtype=np.float32)
+        bias = np.zeros(len(categories), dtype=np.float32)
+        for _ in range(epochs):
+            errors = cls._predict(weights, bias, features, count) - labels
+            for category in range(len(categories)):
+                gradient = np.bincount(
+                    indices, weights=values * errors[rows, category], minlength=vectorizer.dim
+                ) / count
+                weights[category] -= learning_rate * (gradient + l2 * weights[category])
+            bias -= learning_rate * errors.mean(axis=0)
+        return cls(categories, weights, bias, vectorizer=vectorizer)
+
+    def save(self, path: str) -> None:
+        """Write the model to a .npz file."""
+        np = require_numpy("local classifier")
+        np.savez_compressed(
+            path,
+            categories=np.array(self.categories),
+            weights=self.weights,
+            bias=self.bias,
+            threshold=self.threshold,
+            ngram_sizes=np.array(self.vectorizer.ngram_sizes)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        """Read a model written by save()."""
+        np = require_numpy("local classifier")
+        with np.load(path) as data:
+            weights = data["weights"]
+            return cls(
+                [str(category) for category in data["categories"]],
+                weights,
+                data["bias"],
+                threshold=float(data["threshold"]),
+                vectorizer=HashedVectorizer(
+                    dim=weights.shape[1],
+                    ngram_sizes=tuple(int(size) for size in data["ngram_sizes"])
+                )
+            )
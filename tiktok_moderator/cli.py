@@ -0,0 +1,449 @@
+"""Command line interface of the moderator."""
+
+import argparse
+from typing import List, Optional
+
+from .api import ApiEndpoint
+from .budget import TokenBudget
+from .chat import ChatBackend
+from .flood import FloodDetector
+from .hub import ModerationHub
+from .metrics import metrics
+from .moderation import LocalModerationEngine, OpenAIModerationEngine
+from .moderator import TikTokModerator
+from .output import OutputQueue, create_sink, default_sinks
+from .pipeline import CommentPipeline
+from .prefilter import CommentPreFilter
+from .routing import DEFAULT_ROUTES, TriggerRouter
+from .similarity import ReplyCache
+from .storage import EventStore
+from .verdicts import VerdictCache
+
+def parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments (sys.argv when argv is None)."""
+    parser = argparse.ArgumentParser(description="TikTok Live Chat Moderator")
+    parser.add_argument(
+        '--channel', 
+        type=str, 
+        action='append',
+        help='TikTok channel to monitor (e.g. @username), can be repeated'
+    )
+    parser.add_argument(
+        '--channels-file',
+        type=str,
+        help='File listing TikTok channels to monitor, one per line'
+    )
+    parser.add_argument(
+        '--history-size',
+        type=int,
+        default=1000,
+        help='Number of comments to keep in history (default: 1000)'
+    )
+    parser.add_argument(
+        '--history-tokens',
+        type=int,
+        default=500,
+        help='Token budget of the comment history sent with AI replies (default: 500)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of concurrent moderation workers, 0 to process comments inline (default: 4)'
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=100,
+        help='Maximum number of pending comments per worker (default: 100)'
+    )
+    parser.add_argument(
+        '--backpressure',
+        choices=CommentPipeline.BACKPRESSURE_POLICIES,
+        default='spill',
+        help='What to do with new comments when a worker queue is full (default: spill)'
+    )
+    parser.add_argument(
+        '--batch-window-ms',
+        type=int,
+        default=50,
+        help='Time to collect comments into one moderation request, in ms (default: 50)'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=32,
+        help='Maximum number of comments per moderation request (default: 32)'
+    )
+    parser.add_argument(
+        '--blocklist',
+        type=str,
+        help='File of terms (one per line) flagged locally without calling the moderation API'
+    )
+    parser.add_argument(
+        '--verdict-cache',
+        type=str,
+        help='JSON file used to keep moderation verdicts across restarts'
+    )
+    parser.add_argument(
+        '--verdict-cache-size',
+        type=int,
+        default=10000,
+        help='Maximum number of cached moderation verdicts (default: 10000)'
+    )
+    parser.add_argument(
+        '--verdict-cache-ttl',
+        type=float,
+        default=3600,
+        help='Lifetime of a cached moderation verdict, in seconds (default: 3600)'
+    )
+    parser.add_argument(
+        '--offenders-db',
+        type=str,
+        help='SQLite database (e.g. data/tiktok_chat.db) to load and save undesirables'
+    )
+    parser.add_argument(
+        '--moderation-engine',
+        choices=('api', 'local'),
+        default='api',
+        help='Classify comments with the OpenAI moderation API or the --local-model (default: api)'
+    )
+    parser.add_argument(
+        '--local-model',
+        type=str,
+        help='Local moderation model trained with benchmark_moderation.py, also used '
+             'as a fallback while the moderation API is unavailable (requires numpy)'
+    )
+    parser.add_argument(
+        '--local-workers',
+        type=int,
+        help='Number of workers of the local moderation model (default: number of CPUs)'
+    )
+    parser.add_argument(
+        '--local-processes',
+        action='store_true',
+        help='Run the local moderation model in worker processes instead of threads'
+    )
+    parser.add_argument(
+        '--moderation-rpm',
+        type=float,
+        default=1000,
+        help='Moderation API requests allowed per minute (default: 1000)'
+    )
+    parser.add_argument(
+        '--chat-rpm',
+        type=float,
+        default=500,
+        help='Chat API requests allowed per minute (default: 500)'
+    )
+    parser.add_argument(
+        '--chat-tpm',
+        type=float,
+        default=200000,
+        help='Chat API tokens allowed per minute (default: 200000)'
+    )
+    parser.add_argument(
+        '--api-retries',
+        type=int,
+        default=3,
+        help='Number of retries of API calls failing with a rate limit, timeout or server error (default: 3)'
+    )
+    parser.add_argument(
+        '--events-db',
+        type=str,
+        help='SQLite database (e.g. data/tiktok_chat.db) every moderation verdict is stored in'
+    )
+    parser.add_argument(
+        '--events-report',
+        action='store_true',
+        help='Print the top offenders of the week and the flag rate per stream '
+             'from --events-db, then exit'
+    )
+    parser.add_argument(
+        '--record',
+        type=str,
+        help='JSONL file to record incoming comments to, for replay_moderator.py'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Print notifications and replies instead of sending and typing them'
+    )
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='Run without macOS notifications or GUI typing (e.g. in Docker): '
+             'alerts and replies go to the --output sinks, stdout by default'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        action='append',
+        help='Where alerts and replies go: notify, type, stdout, file:PATH or '
+             'webhook:URL (e.g. webhook:http://localhost:8081/api/moderator/events), '
+             'can be repeated (default: notify and type, stdout with --headless; '
+             'type only works with a single channel)'
+    )
+    parser.add_argument(
+        '--reply-rate',
+        type=float,
+        default=1 / 1.5,
+        help='Maximum number of reply chunks typed per second, alerts are not limited (default: 0.67)'
+    )
+    parser.add_argument(
+        '--routes',
+        type=str,
+        help='JSON file routing comments addressed to the host: a list of '
+             '{"name", "handles", "keywords", "regexes", "rooms", "action"} '
+             'with action read, reply, alert or ignore (default: @SamLePirate and Gentil Robot)'
+    )
+    parser.add_argument(
+        '--reply-window-ms',
+        type=int,
+        default=1500,
+        help='Time to collect the comments answered by one AI reply in milliseconds (default: 1500)'
+    )
+    parser.add_argument(
+        '--reply-max-comments',
+        type=int,
+        default=5,
+        help='Maximum number of comments answered by one AI reply, '
+             'a sample is kept during bursts (default: 5)'
+    )
+    parser.add_argument(
+        '--reply-cache',
+        action='store_true',
+        help='Reuse AI replies for questions similar to ones already answered (requires numpy)'
+    )
+    parser.add_argument(
+        '--reply-cache-threshold',
+        type=float,
+        default=0.85,
+        help='Minimum cosine similarity for two questions to share a reply (default: 0.85)'
+    )
+    parser.add_argument(
+        '--reply-cache-size',
+        type=int,
+        default=500,
+        help='Maximum number of cached replies (default: 500)'
+    )
+    parser.add_argument(
+        '--reply-cache-ttl',
+        type=float,
+        default=1800,
+        help='Lifetime of a cached reply in seconds (default: 1800)'
+    )
+    parser.add_argument(
+        '--reply-max-age',
+        type=float,
+        default=30,
+        help='Seconds after which a reply that has not started posting is dropped (default: 30)'
+    )
+    parser.add_argument(
+        '--flood-window',
+        type=float,
+        default=10,
+        help='Sliding window of the flood and raid detector, in seconds (default: 10)'
+    )
+    parser.add_argument(
+        '--flood-user-messages',
+        type=int,
+        default=6,
+        help='Messages of one user within the window making a flood, 0 to disable (default: 6)'
+    )
+    parser.add_argument(
+        '--flood-duplicates',
+        type=int,
+        default=8,
+        help='Near-duplicate messages within the window making a flood: one alert is sent '
+             'for the whole flood instead of one per message, 0 to disable (default: 8)'
+    )
+    parser.add_argument(
+        '--raid-factor',
+        type=float,
+        default=4,
+        help='Ratio of a room\'s comment rate to its usual rate making a raid, 0 to disable (default: 4)'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics'
+    )
+    parser.add_argument(
+        '--llm-backend',
+        choices=list(ChatBackend.PRESETS),
+        default='openai',
+        help='Backend used for AI replies: OpenAI or a local Ollama/llama.cpp server, '
+             'which gets LLM_API_KEY instead of OPENAI_API_KEY (default: openai)'
+    )
+    parser.add_argument(
+        '--llm-model',
+        type=str,
+        help='Model used for AI replies (default: gpt-4o-mini, llama3.2 for Ollama)'
+    )
+    parser.add_argument(
+        '--llm-base-url',
+        type=str,
+        help='URL of an OpenAI-compatible server, overriding the backend default'
+    )
+    parser.add_argument(
+        '--budget-hourly-usd',
+        type=float,
+        help='AI reply spending limit over the last hour, all channels together: '
+             'replies use a shorter history, then --budget-cheap-model, then stop as it approaches'
+    )
+    parser.add_argument(
+        '--budget-stream-usd',
+        type=float,
+        help='AI reply spending limit of each channel for the whole stream, degraded like --budget-hourly-usd'
+    )
+    parser.add_argument(
+        '--budget-cheap-model',
+        type=str,
+        default='gpt-4.1-nano',
+        help='Model used for AI replies when a spending limit is close (default: gpt-4.1-nano)'
+    )
+    parser.add_argument(
+        '--no-stream',
+        action='store_true',
+        help='Wait for complete AI replies instead of streaming them'
+    )
+    args = parser.parse_args(argv)
+    
+    args.channels = list(args.channel or [])
+    if args.channels_file:
+        with open(args.channels_file, encoding="utf-8") as f:
+            args.channels += [
+                line.strip() for line in f
+                if line.strip() and not line.lstrip().startswith("#")
+            ]
+    if args.moderation_engine == "local" and not args.local_model:
+        parser.error("--moderation-engine local requires --local-model")
+    if args.events_report and not args.events_db:
+        parser.error("--events-report requires --events-db")
+    if not args.channels and not args.events_report:
+        parser.error("at least one --channel or a --channels-file is required")
+    # The typing sink pastes into the focused chat window, whatever the room
+    if (
+        len(args.channels) > 1
+        and not args.dry_run
+        and any(spec.partition(":")[0] == "type" for spec in args.output or [])
+    ):
+        parser.error("--output type can only be used with a single channel")
+    return args
+
+
+def create_hub(args: argparse.Namespace) -> ModerationHub:
+    """Create the shared services and one moderator per channel from parsed command line arguments."""
+    blocklist = None
+    if args.blocklist:
+        blocklist = CommentPreFilter.load_blocklist(args.blocklist)
+    
+    routes = DEFAULT_ROUTES
+    if args.routes:
+        routes = TriggerRouter.load(args.routes)
+    
+    api_engine = OpenAIModerationEngine(endpoint=ApiEndpoint(
+        "moderations",
+        rpm=args.moderation_rpm,
+        max_retries=args.api_retries
+    ))
+    local_engine = None
+    if args.local_model:
+        local_engine = LocalModerationEngine(
+            args.local_model,
+            workers=args.local_workers,
+            processes=args.local_processes
+        )
+    
+    if args.output and not args.dry_run:
+        sinks = [create_sink(spec) for spec in args.output]
+    else:
+        # Replies are only typed in the chat when a route asks for them
+        replies = any(route["action"] == "reply" for route in routes)
+        typing = replies and len(args.channels) == 1
+        if replies and not typing and not (args.dry_run or args.headless):
+            print("Several channels are monitored, AI replies will not be typed in the chat")
+        sinks = default_sinks(args.dry_run, args.headless, typing=typing)
+    
+    hub = ModerationHub(
+        workers=args.workers,
+        queue_size=args.queue_size,
+        backpressure=args.backpressure,
+        batch_window_ms=args.batch_window_ms,
+        batch_size=args.batch_size,
+        blocklist=blocklist,
+        verdict_cache=VerdictCache(
+            max_size=args.verdict_cache_size,
+            ttl=args.verdict_cache_ttl,
+            path=args.verdict_cache
+        ),
+        offenders_db=args.offenders_db,
+        record_path=args.record,
+        events_db=args.events_db,
+        moderation_engine=local_engine if args.moderation_engine == "local" else api_engine,
+        fallback_engine=local_engine if args.moderation_engine == "api" else None,
+        chat=ChatBackend(
+            backend=args.llm_backend,
+            model=args.llm_model,
+            base_url=args.llm_base_url,
+            stream=not args.no_stream,
+            endpoint=ApiEndpoint(
+                "chat",
+                rpm=args.chat_rpm,
+                tpm=args.chat_tpm,
+                max_retries=args.api_retries
+            ),
+            budget=TokenBudget(
+                hourly_usd=args.budget_hourly_usd,
+                stream_usd=args.budget_stream_usd,
+                cheap_model=args.budget_cheap_model if args.llm_backend == "openai" else None
+            )
+        ),
+        output=OutputQueue(
+            sinks,
+            rate=args.reply_rate,
+            max_age=args.reply_max_age
+        ),
+        reply_cache=ReplyCache(
+            threshold=args.reply_cache_threshold,
+            max_size=args.reply_cache_size,
+            ttl=args.reply_cache_ttl
+        ) if args.reply_cache else None,
+        floods=FloodDetector(
+            window=args.flood_window,
+            user_messages=args.flood_user_messages,
+            duplicates=args.flood_duplicates,
+            raid_factor=args.raid_factor
+        )
+    )
+    for channel in args.channels:
+        TikTokModerator(
+            channel=channel,
+            max_comments_history=args.history_size,
+            history_tokens=args.history_tokens,
+            reply_window_ms=args.reply_window_ms,
+            reply_max_comments=args.reply_max_comments,
+            routes=routes,
+            hub=hub
+        )
+    return hub
+
+
+def main() -> None:
+    """Main entry point for the script."""
+    # Parse command line arguments
+    args = parse_arguments()
+    
+    if args.events_report:
+        events = EventStore(args.events_db)
+        events.print_report()
+        events.close()
+        return
+    
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    
+    # Create and run the moderators
+    hub = create_hub(args)
+    hub.run()
@@ -0,0 +1,313 @@
+"""Streaming detector of user floods, near-duplicate spam and room raids."""
+
+import itertools
+import time
+import unicodedata
+from collections import deque, OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from .verdicts import VerdictCache
+
+# Each byte value spread into eight 8-bit lanes, one per bit, so that adding
+# spread values counts the set bits of many hashes at once
+_SPREAD = [sum(((value >> bit) & 1) << (8 * bit) for bit in range(8)) for value in range(256)]
+_MASK = (1 << 64) - 1
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the character trigrams of a normalized text."""
+    # Lanes hold up to 255 votes
+    text = text[:256]
+    shingles = max(1, len(text) - 2)
+    votes = 0
+    for start in range(shingles):
+        value = hash(text[start:start + 3]) & _MASK
+        for byte in range(8):
+            votes += _SPREAD[(value >> (8 * byte)) & 255] << (64 * byte)
+    fingerprint = 0
+    for bit in range(64):
+        if ((votes >> (8 * bit)) & 255) * 2 > shingles:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class FloodDetector:
+    """Sliding-window detector of floods and raids, run before any API call.
+
+    Three signals are tracked per room, each in bounded memory with O(1)
+    work per comment:
+
+    - the message rate of each user, over the last ``window`` seconds;
+    - clusters of near-duplicate comments across users, found through the
+      bands of their SimHash fingerprints;
+    - the room's comment rate in one-second buckets, compared with a
+      moving average of its usual rate.
+
+    Each flood or raid is reported by a single aggregated alert. Comments
+    of a flooding cluster are still moderated one by one, since a variant
+    may add an insult to an harmless text; exact repeats share a verdict
+    through the verdict cache, and their individual alerts are left to
+    the aggregated one.
+    """
+
+    # SimHash bands: fingerprints within MAX_DISTANCE bits share at least one
+    BANDS = 8
+    MAX_DISTANCE = 7
+
+    def __init__(
+        self,
+        window: float = 10,
+        user_messages: int = 6,
+        duplicates: int = 8,
+        raid_factor: float = 4,
+        raid_min_comments: int = 30,
+        min_length: int = 12,
+        max_users: int = 10000,
+        max_clusters: int = 2000
+    ):
+        """
+        Initialize the detector.
+
+        Args:
+            window: Length of the sliding windows, in seconds
+            user_messages: Messages of one user within the window making a flood (0 disables)
+            duplicates: Near-duplicate messages within the window making a flood (0 disables)
+            raid_factor: Ratio of the room's rate to its usual rate making a raid (0 disables)
+            raid_min_comments: Minimum number of comments within the window for a raid
+            min_length: Minimum length of the comments checked for near-duplicates
+            max_users: Maximum number of users tracked
+            max_clusters: Maximum number of near-duplicate clusters tracked
+        """
+        self.window = window
+        self.user_messages = user_messages
+        self.duplicates = duplicates
+        self.raid_factor = raid_factor
+        self.raid_min_comments = raid_min_comments
+        self.min_length = min_length
+        self.max_users = max_users
+        self.max_clusters = max_clusters
+        # (room, user) -> [times of the last messages, flooding]
+        self._users: OrderedDict = OrderedDict()
+        # Cluster id -> cluster of near-duplicate comments
+        self._clusters: OrderedDict = OrderedDict()
+        # (room, band index, band value) -> cluster id
+        self._bands: Dict[Tuple[str, int, int], int] = {}
+        self._cluster_ids = itertools.count()
+        self._rooms: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"user": 0, "duplicate": 0, "repeat": 0, "raid": 0}
+
+    @staticmethod
+    def normalize(comment_text: str) -> str:
+        """Casefold a comment and keep its unaccented words, so decorations do not matter."""
+        return " ".join("".join(
+            char if char.isalnum() else " "
+            for char in unicodedata.normalize("NFKD", comment_text.casefold())
+            if not unicodedata.combining(char)
+        ).split())
+
+    def _band_keys(self, room: str, fingerprint: int) -> List[Tuple[str, int, int]]:
+        bits = 64 // self.BANDS
+        mask = (1 << bits) - 1
+        return [(room, band, (fingerprint >> (band * bits)) & mask) for band in range(self.BANDS)]
+
+    def _check_user(self, room: str, user: str, now: float) -> bool:
+        """Record a message of a user, telling whether it starts a flood."""
+        key = (room, user)
+        entry = self._users.get(key)
+        if entry is None:
+            entry = self._users[key] = [deque(maxlen=self.user_messages), False]
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(key)
+        times = entry[0]
+        times.append(now)
+        flooding = len(times) == times.maxlen and times[0] >= now - self.window
+        started = flooding and not entry[1]
+        entry[1] = flooding
+        return started
+
+    def _find_cluster(self, room: str, text: str) -> Dict[str, Any]:
+        """Return the cluster of near-duplicates of a text, creating it if needed."""
+        fingerprint = simhash(text)
+        keys = self._band_keys(room, fingerprint)
+        for key in keys:
+            cluster_id = self._bands.get(key)
+            if cluster_id is None:
+                continue
+            cluster = self._clusters[cluster_id]
+            if bin(cluster["fingerprint"] ^ fingerprint).count("1") <= self.MAX_DISTANCE:
+                self._clusters.move_to_end(cluster_id)
+                return cluster
+
+        cluster_id = next(self._cluster_ids)
+        cluster = {
+            "id": cluster_id,
+            "fingerprint": fingerprint,
+            "keys": keys,
+            "times": deque(maxlen=self.duplicates),
+            "text": None,
+            "key": None,
+            "users": OrderedDict(),
+            "count": 0,
+            "flooding": False,
+        }
+        self._clusters[cluster_id] = cluster
+        for key in keys:
+            self._bands[key] = cluster_id
+        if len(self._clusters) > self.max_clusters:
+            _, evicted = self._clusters.popitem(last=False)
+            for key in evicted["keys"]:
+                if self._bands.get(key) == evicted["id"]:
+                    del self._bands[key]
+        return cluster
+
+    def _check_room(self, room: str, now: float) -> Optional[Tuple[int, float]]:
+        """Count a comment of a room, returning its window count and usual rate when a raid starts."""
+        second = int(now)
+        state = self._rooms.get(room)
+        if state is None:
+            size = max(1, int(self.window))
+            state = self._rooms[room] = {
+                "buckets": [0] * size,
+                "second": second,
+                "total": 0,
+                "usual": 0.0,
+                "since": second,
+                "raid": False,
+            }
+        buckets = state["buckets"]
+        size = len(buckets)
+        # Roll the buckets forward, folding the comments per second that
+        # leave the window into the usual rate (a moving average over a minute)
+        elapsed = second - state["second"]
+        for step in range(min(max(0, elapsed), size)):
+            index = (state["second"] + step + 1) % size
+            state["usual"] += (buckets[index] - state["usual"]) / 60
+            state["total"] -= buckets[index]
+            buckets[index] = 0
+        if elapsed > size:
+            state["usual"] *= (59 / 60) ** (elapsed - size)
+        state["second"] = max(second, state["second"])
+        buckets[state["second"] % size] += 1
+        state["total"] += 1
+
+        # The usual rate is only known after a minute
+        raid = (
+            second - state["since"] >= 60
+            and state["total"] >= self.raid_min_comments
+            and state["total"] / size >= self.raid_factor * state["usual"]
+        )
+        started = raid and not state["raid"]
+        state["raid"] = raid
+        return (state["total"], state["usual"]) if started else None
+
+    def check(
+        self,
+        room: str,
+        user: str,
+        comment_text: str,
+        nickname: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Track a comment.
+
+        Args:
+            room: Channel the comment was posted in
+            user: Unique id of the author
+            comment_text: Comment to track
+            nickname: Display name of the author
+            now: Arrival time of the comment (time.monotonic() if None)
+
+        Returns:
+            None for an ordinary comment, otherwise a dict with
+            "flooding" (user or duplicate when the comment is part of a
+            flood, None otherwise), "repeat" (the comment repeats the
+            first comment of its flood, once normalized like verdicts),
+            "alerts" ((title, message) pairs to send) and "offenders"
+            ((user, nickname) pairs newly caught flooding)
+        """
+        if now is None:
+            now = time.monotonic()
+        nickname = nickname or user
+        alerts = []
+        offenders = []
+        flooding = None
+        repeat = False
+
+        if self.raid_factor:
+            raid = self._check_room(room, now)
+            if raid is not None:
+                total, usual = raid
+                self.stats["raid"] += 1
+                alerts.append((
+                    "Raid détecté!",
+                    f"{room}: {total} messages en {self.window:.0f}s "
+                    f"(habituellement {usual * self.window:.0f})"
+                ))
+
+        if self.user_messages and self._check_user(room, user, now):
+            self.stats["user"] += 1
+            flooding = "user"
+            offenders.append((user, nickname))
+            alerts.append((
+                "Flood détecté!",
+                f"{nickname}: {self.user_messages} messages en moins de {self.window:.0f}s"
+            ))
+        elif self.user_messages and self._users[(room, user)][1]:
+            flooding = "user"
+
+        text = self.normalize(comment_text)
+        if self.duplicates and len(text) >= self.min_length:
+            cluster = self._find_cluster(room, text)
+            times = cluster["times"]
+            if times and times[-1] < now - self.window:
+                # A new wave of an old cluster
+                cluster["flooding"] = False
+                cluster["users"].clear()
+                cluster["count"] = 0
+                times.clear()
+            if not times:
+                cluster["text"] = comment_text
+                cluster["key"] = VerdictCache.normalize(comment_text)
+            times.append(now)
+            cluster["count"] += 1
+            # Users posting the same thing once may just be asking a
+            # popular question; only repeat posters count as offenders
+            posts = cluster["users"].get(user, (nickname, 0))[1] + 1
+            cluster["users"][user] = (nickname, posts)
+            if len(cluster["users"]) > 50:
+                cluster["users"].popitem(last=False)
+
+            if cluster["flooding"]:
+                self.stats["duplicate"] += 1
+                flooding = "duplicate"
+                repeat = VerdictCache.normalize(comment_text) == cluster["key"]
+                if repeat:
+                    self.stats["repeat"] += 1
+                if posts == 2 and (user, nickname) not in offenders:
+                    offenders.append((user, nickname))
+            elif len(times) == times.maxlen and times[0] >= now - self.window:
+                cluster["flooding"] = True
+                flooding = "duplicate"
+                offenders += [
+                    (member, name) for member, (name, count) in cluster["users"].items()
+                    if count > 1 and (member, name) not in offenders
+                ]
+                names = [name for name, _ in cluster["users"].values()]
+                alerts.append((
+                    "Flood détecté!",
+                    f"{cluster['count']} messages similaires de {len(names)} utilisateur(s) "
+                    f"en moins de {self.window:.0f}s: {', '.join(names[:10])}"
+                    f"{'…' if len(names) > 10 else ''}\n« {cluster['text']} »"
+                ))
+
+        if not (flooding or alerts):
+            return None
+        return {
+            "flooding": flooding,
+            "repeat": repeat,
+            "alerts": alerts,
+            "offenders": offenders,
+        }
@@ -0,0 +1,84 @@
+"""Token-budgeted history of recent comments."""
+
+from collections import deque
+from typing import List, Optional
+
+# Encoding used by gpt-4o-mini, loaded on first use since tiktoken may have
+# to download it; False once it is known to be unavailable
+_token_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text, or estimate them when tiktoken is not available."""
+    global _token_encoding
+    if _token_encoding is None:
+        try:
+            import tiktoken
+            _token_encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:  # Not installed, or the encoding cannot be downloaded
+            _token_encoding = False
+    if _token_encoding:
+        return len(_token_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+class CommentHistory:
+    """Ring buffer of recent comments used as context for AI replies.
+
+    Each entry keeps its prompt line and token count, computed once when
+    the comment arrives, so building a context only walks the newest
+    comments that fit in the token budget.
+    """
+
+    def __init__(self, max_size: int = 1000, max_tokens: int = 500):
+        """
+        Initialize the history.
+
+        Args:
+            max_size: Maximum number of comments kept
+            max_tokens: Token budget of the context built for a reply
+        """
+        self.max_tokens = max_tokens
+        self._entries: deque = deque(maxlen=max(1, max_size))
+        self.next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, username: str, message: str) -> int:
+        """
+        Add a comment to the history.
+
+        Returns:
+            Sequence number of the comment
+        """
+        seq = self.next_seq
+        self.next_seq += 1
+        line = f"{username}: {message}\n"
+        self._entries.append((seq, username, message, line, count_tokens(line)))
+        return seq
+
+    def context(self, before_seq: Optional[int] = None, max_tokens: Optional[int] = None) -> List[str]:
+        """
+        Return the prompt lines of the newest comments fitting the token budget.
+
+        Args:
+            before_seq: Only use comments older than this sequence number
+            max_tokens: Token budget, defaults to the history's budget
+
+        Returns:
+            Prompt lines, oldest first
+        """
+        if before_seq is None:
+            before_seq = self.next_seq
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        lines = []
+        for seq, _, _, line, tokens in reversed(self._entries):
+            if seq >= before_seq:
+                continue
+            if tokens > budget:
+                break
+            budget -= tokens
+            lines.append(line)
+        lines.reverse()
+        return lines
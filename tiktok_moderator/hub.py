@@ -0,0 +1,254 @@
+"""Moderation services shared by every room of the process."""
+
+import asyncio
+import itertools
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+
+from .chat import ChatBackend
+from .flood import FloodDetector
+from .metrics import metrics
+from .moderation import ModerationBatcher, ModerationEngine
+from .offenders import OffenderRegistry
+from .output import OutputQueue, default_sinks
+from .pipeline import CommentPipeline
+from .prefilter import CommentPreFilter
+from .similarity import ReplyCache
+from .storage import CommentRecorder, EventStore
+from .verdicts import VerdictCache, make_moderation_result
+
+if TYPE_CHECKING:
+    from .moderator import TikTokModerator
+
+class ModerationHub:
+    """Moderation services shared by every room of the process.
+
+    The worker pool, moderation batcher, pre-filter, verdict cache and
+    offender registry are shared, and all TikTokLive clients run on the
+    same event loop. Each room (TikTokModerator) keeps its own history
+    and reply policy.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        queue_size: int = 100,
+        backpressure: str = "spill",
+        batch_window_ms: int = 50,
+        batch_size: int = 32,
+        blocklist: Optional[List[str]] = None,
+        verdict_cache: Optional[VerdictCache] = None,
+        offenders_db: Optional[str] = None,
+        record_path: Optional[str] = None,
+        events_db: Optional[str] = None,
+        moderation_engine: Optional[ModerationEngine] = None,
+        fallback_engine: Optional[ModerationEngine] = None,
+        chat: Optional[ChatBackend] = None,
+        output: Optional[OutputQueue] = None,
+        reply_cache: Optional[ReplyCache] = None,
+        floods: Optional[FloodDetector] = None
+    ):
+        """
+        Initialize the shared services.
+
+        Args:
+            workers: Number of moderation workers (0 processes comments inline)
+            queue_size: Maximum number of pending comments per worker and room
+            backpressure: Policy applied when a worker queue is full
+            batch_window_ms: Time to collect comments into one moderation request
+            batch_size: Maximum number of comments per moderation request
+            blocklist: Terms flagged locally without calling the moderation API
+            verdict_cache: Cache of moderation verdicts (a fresh in-memory one if None)
+            offenders_db: SQLite database to load and save undesirables
+            record_path: JSONL file incoming comments are recorded to
+            events_db: SQLite database every moderation verdict is stored in
+            moderation_engine: Engine classifying comments (the OpenAI moderation API if None)
+            fallback_engine: Engine used while the moderation engine fails
+            chat: Backend used for AI replies (streamed OpenAI if None)
+            output: Queue sending alerts and replies (notifications and typing if None)
+            reply_cache: Cache reusing replies to recurring questions (disabled if None)
+            floods: Detector of floods and raids run before moderation (default limits if None)
+        """
+        self.rooms: Dict[str, "TikTokModerator"] = {}
+        self.offenders = OffenderRegistry()
+        self.offenders_db = offenders_db
+        if offenders_db:
+            loaded = self.offenders.load(offenders_db)
+            print(f"Loaded {loaded} undesirables from {offenders_db}")
+        self.recorder = CommentRecorder(record_path) if record_path else None
+        self.events = EventStore(events_db) if events_db else None
+        self.prefilter = CommentPreFilter(blocklist)
+        self.floods = floods or FloodDetector()
+        self.verdict_cache = verdict_cache or VerdictCache()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.batcher = ModerationBatcher(
+            window_ms=batch_window_ms,
+            batch_size=batch_size,
+            engine=moderation_engine,
+            fallback=self._fallback_verdicts
+        )
+        self.fallback_engine = fallback_engine
+        self.chat = chat or ChatBackend()
+        self.output = output or OutputQueue(default_sinks())
+        self._reply_ids = itertools.count(1)
+        self.reply_cache = reply_cache
+        self.pipeline = None
+        if workers > 0:
+            self.pipeline = CommentPipeline(
+                self._dispatch,
+                workers=workers,
+                queue_size=queue_size,
+                policy=backpressure
+            )
+        metrics.gauge("queue_depth", self.pipeline.pending if self.pipeline else lambda: 0)
+        metrics.gauge("moderation_batch_pending", lambda: len(self.batcher._pending))
+        metrics.gauge("moderation_inflight", lambda: len(self._inflight))
+        metrics.gauge("rooms", lambda: len(self.rooms))
+        metrics.gauge("llm_hourly_cost_usd", self.chat.budget.hourly_spend)
+
+    def add_room(self, room: "TikTokModerator") -> None:
+        """Register a room so that its queued comments are dispatched to it."""
+        self.rooms[room.channel] = room
+
+    async def _dispatch(self, item: Dict[str, Any]) -> None:
+        """Hand a queued comment back to the room it came from."""
+        await self.rooms[item["room"]]._process_comment(item)
+
+    def moderate(self, user: str, comment_text: str) -> asyncio.Future:
+        """Return a future moderation result, from the pre-filter, the cache or the API."""
+        with metrics.time("stage_seconds", stage="prefilter"):
+            result = self.prefilter.check(user, comment_text)
+            if result is None:
+                result = self.verdict_cache.get(comment_text)
+        if result is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(result)
+            return future
+
+        # Identical comments arriving together share a single API verdict,
+        # whichever room they come from
+        key = VerdictCache.normalize(comment_text)
+        future = self._inflight.get(key)
+        if future is None:
+            future = self.batcher.submit(user, comment_text)
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._on_verdict(key, comment_text, done))
+        return future
+
+    def _on_verdict(self, key: str, comment_text: str, future: asyncio.Future) -> None:
+        """Cache a verdict returned by the moderation API."""
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            if not getattr(future.result(), "degraded", False):
+                self.verdict_cache.put(comment_text, future.result())
+
+    async def _fallback_verdicts(self, comment_texts: List[str]) -> List[Any]:
+        """
+        Moderate comments while the moderation engine is unavailable.
+
+        Comments go to the fallback engine when there is one. Otherwise,
+        as blocklisted terms were already flagged by the pre-filter, they
+        are let through. Results are marked as degraded so they are
+        neither cached nor remembered as accepted.
+        """
+        if self.fallback_engine is not None:
+            results = await self.fallback_engine.moderate(comment_texts)
+        else:
+            results = [make_moderation_result({}) for _ in comment_texts]
+        for result in results:
+            result.degraded = True
+        return results
+
+    def warm_up(self) -> None:
+        """
+        Create the API clients and load the tokenizer before comments arrive.
+
+        They are created on first use so that importing the package has no
+        side effects, but doing it on the event loop would stall the first
+        comments for a second or more.
+        """
+        for service in (self.batcher.engine, self.fallback_engine, self.chat):
+            if service is None:
+                continue
+            try:
+                service.warm_up()
+            except Exception as e:
+                # Left to the first call, which reports it like any API error
+                print(f"[WARN] Could not prepare {type(service).__name__}: {e}")
+
+    async def _run_clients(self) -> None:
+        """Run the TikTokLive clients of every room on the current loop."""
+        rooms = list(self.rooms.values())
+        results = await asyncio.gather(
+            *(room.client.connect() for room in rooms),
+            return_exceptions=True
+        )
+        for room, result in zip(rooms, results):
+            if isinstance(result, Exception):
+                print(f"[ERROR] Error running TikTok client for {room.channel}: {result}")
+
+    def run(self) -> None:
+        """Run every room until interrupted, then save state and print statistics."""
+        try:
+            print(f"Starting moderation for channels: {', '.join(self.rooms)}")
+            self.warm_up()
+            asyncio.run(self._run_clients())
+        except KeyboardInterrupt:
+            print("Moderator stopped by user")
+        except Exception as e:
+            print(f"[ERROR] Error running TikTok clients: {e}")
+        self.close()
+
+    def close(self) -> None:
+        """Save caches and offenders, and print statistics."""
+        for room in self.rooms.values():
+            room.replies.close()
+        self.output.close()
+        self.batcher.engine.close()
+        if self.fallback_engine is not None:
+            self.fallback_engine.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.events is not None:
+            self.events.close()
+            print(f"Saved {self.events.written} moderation events to {self.events.db_path}")
+        self.verdict_cache.save()
+        if self.offenders_db:
+            saved = self.offenders.save(self.offenders_db)
+            print(f"Saved {saved} new undesirables to {self.offenders_db}")
+        self.print_stats()
+        metrics.stop()
+
+    def print_stats(self) -> None:
+        """Print moderation call statistics."""
+        stats = self.prefilter.stats
+        print(
+            f"Pre-filter: {self.prefilter.saved_calls()} API calls saved "
+            f"(blocked: {stats['blocked']}, emoji: {stats['emoji']}, "
+            f"greeting: {stats['greeting']}, repeat: {stats['repeat']}), "
+            f"{stats['escalated']} escalated"
+        )
+        floods = self.floods.stats
+        print(
+            f"Flood detector: {floods['duplicate']} flooding near-duplicates "
+            f"({floods['repeat']} exact repeats), "
+            f"{floods['user']} user floods, {floods['raid']} raids"
+        )
+        print(
+            f"Moderation ({self.batcher.engine.name}): {self.batcher.request_count} requests "
+            f"for {self.batcher.input_count} comments"
+        )
+        print(
+            f"Verdict cache: {self.verdict_cache.hits} hits, "
+            f"{self.verdict_cache.misses} misses"
+        )
+        if self.reply_cache is not None:
+            print(
+                f"Reply cache: {self.reply_cache.hits} hits, "
+                f"{self.reply_cache.misses} misses "
+                f"({self.reply_cache.hit_rate():.0%} hit rate)"
+            )
+        budget = self.chat.budget.report()
+        if budget:
+            print("LLM usage:")
+            print("\n".join(budget))
+        print(metrics.summary())
@@ -0,0 +1,161 @@
+"""Counters, gauges and latency histograms exported in the Prometheus format."""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+class Metrics:
+    """Counters, gauges and latency histograms of the moderation hot path.
+
+    Metrics can be served in the Prometheus text format on a local
+    ``/metrics`` endpoint and are printed as a summary on shutdown.
+    """
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, prefix: str = "moderator_"):
+        """
+        Initialize the registry.
+
+        Args:
+            prefix: Prefix of every metric name
+        """
+        self.prefix = prefix
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], List[Any]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increment a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Record a duration in a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.BUCKETS) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    @contextmanager
+    def time(self, name: str, **labels: str):
+        """Record the duration of a block, including awaits inside it."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Register a gauge read when metrics are exported."""
+        self._gauges[name] = read
+
+    @staticmethod
+    def _labels(labels: Tuple, extra: str = "") -> str:
+        parts = [f'{key}="{value}"' for key, value in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        """Export the metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, [list(value[0]), value[1], value[2]]) for key, value in self._histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {self.prefix}{name} counter")
+            lines.append(f"{self.prefix}{name}{self._labels(labels)} {value}")
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {self.prefix}{name} histogram")
+            cumulative = 0
+            for bound, bucket in zip(self.BUCKETS + (float("inf"),), buckets):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.prefix}{name}_bucket{self._labels(labels, le)} {cumulative}")
+            lines.append(f"{self.prefix}{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self.prefix}{name}_count{self._labels(labels)} {count}")
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = read()
+                lines.append(f"# TYPE {self.prefix}{name} gauge")
+                lines.append(f"{self.prefix}{name} {value}")
+            except Exception as e:
+                print(f"[ERROR] Failed to read gauge {name}: {e}")
+        return "\n".join(lines) + "\n"
+
+    def _quantile(self, buckets: List[int], count: int, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        rank = q * count
+        cumulative = 0
+        for bound, bucket in zip(self.BUCKETS + (float("inf"),), buckets):
+            cumulative += bucket
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self) -> str:
+        """Human readable summary of the latencies and counters."""
+        lines = ["Latency (count, mean, p50/p95/p99 upper bounds):"]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for (name, labels), (buckets, total, count) in histograms:
+            label = ",".join(str(value) for _, value in labels)
+            quantiles = "/".join(
+                f"{self._quantile(buckets, count, q) * 1000:g}ms" for q in (0.5, 0.95, 0.99)
+            )
+            lines.append(f"  {name}[{label}]: {count}, {total / count * 1000:.1f}ms, {quantiles}")
+        lines.append("Counters:")
+        for (name, labels), value in counters:
+            label = ",".join(str(value) for _, value in labels)
+            lines.append(f"  {name}[{label}]: {value:g}")
+        return "\n".join(lines)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Serve /metrics from a background thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                data = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Metrics available on http://{host}:{port}/metrics")
+
+    def stop(self) -> None:
+        """Stop the /metrics endpoint."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+metrics = Metrics()
@@ -0,0 +1,227 @@
+"""Moderation engines and the batcher grouping comments into engine calls."""
+
+import asyncio
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Any, Optional, Callable, Awaitable, Tuple
+
+from .api import ApiEndpoint, MODERATION_TIMEOUT, get_client
+from .classifier import LocalClassifier
+from .metrics import metrics
+
+class ModerationEngine:
+    """Classifies batches of comments for the ModerationBatcher."""
+
+    name = ""
+
+    async def moderate(self, comment_texts: List[str]) -> List[Any]:
+        """Return one moderation result, shaped like the API's, per comment."""
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        """Load what the engine needs before the first comment arrives."""
+
+    def close(self) -> None:
+        """Release the resources of the engine."""
+
+
+class OpenAIModerationEngine(ModerationEngine):
+    """Moderation with the OpenAI moderation endpoint."""
+
+    name = "api"
+
+    def __init__(self, model: str = "omni-moderation-latest", endpoint: Optional[ApiEndpoint] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            model: Moderation model to use
+            endpoint: Rate limits, retries and circuit breaker of the moderation endpoint
+        """
+        self.model = model
+        self.endpoint = endpoint or ApiEndpoint("moderations")
+
+    async def moderate(self, comment_texts: List[str]) -> List[Any]:
+        metrics.inc("api_calls_total", endpoint="moderations")
+        try:
+            with metrics.time("api_request_seconds", endpoint="moderations"):
+                response = await self.endpoint.call(lambda: get_client().moderations.create(
+                    model=self.model,
+                    input=comment_texts,
+                    timeout=MODERATION_TIMEOUT
+                ))
+        except Exception:
+            metrics.inc("api_errors_total", endpoint="moderations")
+            raise
+        return response.results
+
+    def warm_up(self) -> None:
+        get_client()
+
+
+# Classifier of the worker processes of a LocalModerationEngine
+_worker_classifier: Optional[LocalClassifier] = None
+
+
+def _load_worker_classifier(model_path: str) -> None:
+    global _worker_classifier
+    _worker_classifier = LocalClassifier.load(model_path)
+
+
+def _classify_in_worker(comment_texts: List[str]) -> List[Any]:
+    return _worker_classifier.classify(comment_texts)
+
+
+class LocalModerationEngine(ModerationEngine):
+    """Moderation with a LocalClassifier, on a pool of CPU workers.
+
+    Batches are split into chunks classified in parallel, by threads
+    (NumPy releases the GIL) or by processes, which also parallelize the
+    n-gram extraction at the cost of sending texts and results between
+    processes.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_path: str,
+        workers: Optional[int] = None,
+        processes: bool = False,
+        chunk_size: Optional[int] = None
+    ):
+        """
+        Load the model and start the workers.
+
+        Args:
+            model_path: Model written by LocalClassifier.save()
+            workers: Number of workers (the number of CPUs if None)
+            processes: Use worker processes instead of threads
+            chunk_size: Number of comments classified by a worker at once
+                (each batch is spread over every worker if None)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size) if chunk_size else None
+        self.classifier = LocalClassifier.load(model_path)
+        if processes:
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                initializer=_load_worker_classifier,
+                initargs=(model_path,)
+            )
+            self._classify = _classify_in_worker
+        else:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="moderation")
+            self._classify = self.classifier.classify
+
+    async def moderate(self, comment_texts: List[str]) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        chunk_size = self.chunk_size or max(1, math.ceil(len(comment_texts) / self.workers))
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self._classify, comment_texts[start:start + chunk_size])
+            for start in range(0, len(comment_texts), chunk_size)
+        ))
+        return [result for chunk in chunks for result in chunk]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ModerationBatcher:
+    """Groups moderation requests into a single engine call.
+
+    The moderation engines accept a list of inputs, so comments are
+    collected for up to ``window_ms`` milliseconds or ``batch_size`` items
+    and sent together. Each caller gets a future resolved with the result
+    matching its own comment.
+    """
+
+    def __init__(
+        self,
+        window_ms: int = 50,
+        batch_size: int = 32,
+        engine: Optional[ModerationEngine] = None,
+        fallback: Optional[Callable[[List[str]], Awaitable[List[Any]]]] = None
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            window_ms: Maximum time to wait for a batch to fill, in milliseconds
+            batch_size: Maximum number of comments per request
+            engine: Engine classifying the batches (the OpenAI moderation API if None)
+            fallback: Moderation used when the engine fails (errors are raised if None)
+        """
+        self.window = max(0, window_ms) / 1000
+        self.batch_size = max(1, batch_size)
+        self.engine = engine or OpenAIModerationEngine()
+        self.fallback = fallback
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._requests = set()
+        self.request_count = 0
+        self.input_count = 0
+
+    def submit(self, username: str, comment_text: str) -> asyncio.Future:
+        """
+        Queue a comment for the next moderation batch.
+
+        Args:
+            username: Author of the comment
+            comment_text: Comment to moderate
+
+        Returns:
+            Future resolved with the moderation result for this comment
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((username, comment_text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        """Send the pending comments as one request."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._requests.add(task)
+            task.add_done_callback(self._requests.discard)
+
+    async def _send(self, batch: List[Tuple[str, str, asyncio.Future]]) -> None:
+        """Classify a batch with the engine and dispatch the results."""
+        self.request_count += 1
+        self.input_count += len(batch)
+        metrics.inc("moderation_inputs_total", len(batch), engine=self.engine.name)
+        texts = [comment_text for _, comment_text, _ in batch]
+        try:
+            with metrics.time("engine_seconds", engine=self.engine.name):
+                results = await self.engine.moderate(texts)
+        except Exception as e:
+            try:
+                if self.fallback is None:
+                    raise
+                # Comments are still moderated while the engine is unavailable
+                metrics.inc("moderation_fallback_total", len(batch))
+                results = await self.fallback(texts)
+            except Exception:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+        for index, (username, comment_text, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index < len(results):
+                future.set_result(results[index])
+            else:
+                future.set_exception(RuntimeError(
+                    f"No moderation result for {username}: {comment_text}"
+                ))
@@ -0,0 +1,508 @@
+"""TikTok live moderator of a single room."""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, AsyncIterator, TYPE_CHECKING
+
+from .chat import ChatBackend, ReplyChunker
+from .history import CommentHistory
+from .hub import ModerationHub
+from .metrics import metrics
+from .output import OutputQueue, default_sinks
+from .pipeline import ReplyScheduler
+from .prompts import SYSTEM_PROMPT_READER, SYSTEM_PROMPT_RESPONDER
+from .routing import DEFAULT_ROUTES, TriggerRouter
+from .verdicts import VerdictCache
+
+if TYPE_CHECKING:
+    from TikTokLive.events import ConnectEvent, CommentEvent
+
+class TikTokModerator:
+    """TikTok live chat moderation class, one per monitored room."""
+    
+    def __init__(
+        self,
+        channel: str,
+        max_comments_history: int = 1000,
+        history_tokens: int = 500,
+        reply_window_ms: int = 1500,
+        reply_max_comments: int = 5,
+        reader_prompt: str = SYSTEM_PROMPT_READER,
+        routes: Optional[List[Dict[str, Any]]] = None,
+        workers: int = 4,
+        queue_size: int = 100,
+        backpressure: str = "spill",
+        batch_window_ms: int = 50,
+        batch_size: int = 32,
+        blocklist: Optional[List[str]] = None,
+        verdict_cache: Optional[VerdictCache] = None,
+        offenders_db: Optional[str] = None,
+        record_path: Optional[str] = None,
+        dry_run: bool = False,
+        headless: bool = False,
+        chat: Optional[ChatBackend] = None,
+        hub: Optional[ModerationHub] = None,
+        client: Any = None
+    ):
+        """
+        Initialize the TikTok moderator.
+        
+        The shared service options (workers to chat) are only used
+        when no hub is given, to create a hub for this single room.
+        TikTokLive is only imported when the room connects, so tests and
+        replays can drive on_comment without it.
+        
+        Args:
+            channel: TikTok channel to monitor
+            max_comments_history: Maximum number of comments to store in history
+            history_tokens: Token budget of the comment history sent with replies
+            reply_window_ms: Time to collect triggered comments into one reply, in milliseconds
+            reply_max_comments: Maximum number of comments answered in one reply
+            reader_prompt: System prompt used to read the messages addressed to the host
+            routes: Routing table of comments addressed to the host (DEFAULT_ROUTES if None)
+            workers: Number of moderation workers (0 processes comments inline)
+            queue_size: Maximum number of pending comments per worker
+            backpressure: Policy applied when a worker queue is full
+            batch_window_ms: Time to collect comments into one moderation request
+            batch_size: Maximum number of comments per moderation request
+            blocklist: Terms flagged locally without calling the moderation API
+            verdict_cache: Cache of moderation verdicts (a fresh in-memory one if None)
+            offenders_db: SQLite database to load and save undesirables
+            record_path: JSONL file incoming comments are recorded to
+            dry_run: Print notifications and replies instead of sending them
+            headless: Print notifications and replies, for setups without a desktop
+            chat: Backend used for AI replies (streamed OpenAI if None)
+            hub: Services shared with the other rooms of the process
+            client: TikTokLive client, or a stand-in (a new TikTokLiveClient if None)
+        """
+        if routes is None:
+            routes = DEFAULT_ROUTES
+        if hub is None:
+            # Replies are only typed in the chat when a route asks for them
+            typing = any(route["action"] == "reply" for route in routes)
+            hub = ModerationHub(
+                workers=workers,
+                queue_size=queue_size,
+                backpressure=backpressure,
+                batch_window_ms=batch_window_ms,
+                batch_size=batch_size,
+                blocklist=blocklist,
+                verdict_cache=verdict_cache,
+                offenders_db=offenders_db,
+                record_path=record_path,
+                chat=chat,
+                output=OutputQueue(default_sinks(dry_run, headless, typing=typing))
+            )
+        self.hub = hub
+        self.channel = self._format_channel(channel)
+        self.max_comments_history = max_comments_history
+        self.all_comments = CommentHistory(max_comments_history, history_tokens)
+        self.all_allPersons = hub.offenders
+        self.reader_prompt = reader_prompt
+        self.is_first_comment = True
+        self.pipeline = hub.pipeline
+        self.router = TriggerRouter.for_room(routes, self.channel)
+        self.replies = ReplyScheduler(
+            self._respond,
+            window_ms=reply_window_ms,
+            max_comments=reply_max_comments
+        )
+        hub.add_room(self)
+        self._client = client
+        
+        print(f"Moderator initialized for channel: {self.channel}")
+    
+    @property
+    def client(self) -> Any:
+        """TikTokLive client of the room, created when the room connects."""
+        if self._client is None:
+            from TikTokLive import TikTokLiveClient
+            from TikTokLive.events import ConnectEvent, CommentEvent
+            self._client = TikTokLiveClient(unique_id=self.channel)
+            
+            # Register event handlers
+            self._client.add_listener(ConnectEvent, self.on_connect)
+            self._client.add_listener(CommentEvent, self.on_comment)
+        return self._client
+    
+    @staticmethod
+    def _format_channel(channel: str) -> str:
+        """Ensure channel name starts with @."""
+        return channel if channel.startswith('@') else f'@{channel}'
+    
+    _timestamp_second = None
+    _timestamp_text = ""
+    
+    @classmethod
+    def _get_timestamp(cls):
+        """Return current timestamp for logging, formatted once per second."""
+        second = int(time.time())
+        if second != cls._timestamp_second:
+            cls._timestamp_text = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+            cls._timestamp_second = second
+        return cls._timestamp_text
+    
+    async def on_connect(self, event: "ConnectEvent") -> None:
+        """Handle connection event."""
+        timestamp = self._get_timestamp()
+        print(f"[{timestamp}] Connected to @{event.unique_id} (Room ID: {event.room_id})")
+        
+        # Display a test notification on startup
+        notification_title = "TikTok Moderator - Connected"
+        notification_message = f"Successfully connected to {self.channel}\nReady to monitor comments"
+        self._send_notification(notification_message, notification_title, lane="notice")
+    
+    async def on_comment(self, event: "CommentEvent") -> None:
+        """Handle new comments."""
+        received = time.perf_counter()
+        if self.hub.recorder is not None:
+            self.hub.recorder.write(event, self.channel)
+        
+        username = event.user.nickname
+        unique_id = getattr(event.user, "unique_id", None) or username
+        comment_text = event.comment
+        
+        timestamp = self._get_timestamp()
+        
+        
+        # Skip processing for the first comment to avoid initial spam
+        if self.is_first_comment:
+            self.is_first_comment = False
+            return
+        
+        # Add comment to history. The sequence number lets workers build the
+        # context the comment had on arrival, even once newer comments are in.
+        seq = self.all_comments.append(username, comment_text)
+        user_id = str(getattr(event.user, "id", "") or "")
+        
+        # Floods and raids are caught before any API call, and reported once
+        flood = self.hub.floods.check(self.channel, unique_id, comment_text, nickname=username)
+        if flood is not None:
+            self._report_flood(flood, comment_text, unique_id, user_id)
+        
+        item = {
+            "username": username,
+            "unique_id": unique_id,
+            "user_id": user_id,
+            "room": self.channel,
+            "message": comment_text,
+            "timestamp": timestamp,
+            "received": received,
+            "seq": seq,
+            "flood": flood["flooding"] if flood is not None else None,
+            "flood_repeat": flood is not None and flood["repeat"],
+        }
+        metrics.inc("comments_total")
+        metrics.observe("stage_seconds", time.perf_counter() - received, stage="receive")
+        if self.pipeline is None:
+            await self._process_comment(item)
+        elif self.pipeline.submit(item) is item:
+            # Moderation of queued comments starts right away so that batches
+            # fill up with every incoming comment, not just the ones workers
+            # are on. Dropped and coalesced comments are not sent.
+            item["verdict"] = (comment_text, self.hub.moderate(unique_id, comment_text))
+    
+    async def _process_comment(self, item: Dict[str, Any]) -> None:
+        """Moderate a queued comment and route it to the AI handlers."""
+        username = item["username"]
+        comment_text = item["message"]
+        timestamp = item["timestamp"]
+        unique_id = item.get("unique_id", username)
+        comment_data = {"username": username, "message": comment_text}
+        
+        reason = self.all_allPersons.announce(unique_id)
+        if reason is not None:
+            print(f"\033[33m[{timestamp}] Indésirable connu: {username} ({reason})\033[0m")
+        
+        # A coalesced comment no longer matches the text sent for moderation,
+        # so it is moderated again. The old verdict may be shared with
+        # identical comments and must not be cancelled.
+        verdict = None
+        if "verdict" in item:
+            moderated_text, verdict = item["verdict"]
+            if moderated_text != comment_text:
+                verdict = None
+        
+        # Check comment for policy violations
+        try:
+            ok = await self._check_comment_moderation(
+                username,
+                comment_text,
+                verdict,
+                unique_id=unique_id,
+                user_id=item.get("user_id"),
+                received=item.get("received"),
+                notify=not item.get("flood_repeat")
+            )
+            if ok:
+                print(f"[{timestamp}] {username} -> {comment_text}")
+            else:
+                print(f"[{timestamp}] {username} -> {comment_text}")
+        except Exception as e:
+            print(f"[ERROR] Error in moderation check: {e}")
+
+        
+        # Route comments addressed to the host, unless they are part of a flood
+        route = self.router.route(comment_text) if not item.get("flood") else None
+        if route is not None:
+            metrics.inc("routes_total", route=route.get("name", ""))
+            if route["action"] == "read":
+                print(f"Message addressed to {self.channel} ({route.get('name', '')})")
+                with metrics.time("stage_seconds", stage="reply"):
+                    await self._process_direct_message([comment_data])
+            elif route["action"] == "reply":
+                self.replies.submit({**comment_data, "seq": item["seq"]})
+            elif route["action"] == "alert":
+                self._send_notification(
+                    f"{username}: {comment_text}",
+                    f"TikTok Moderator - {route.get('name', 'Trigger')}"
+                )
+        
+        if "received" in item:
+            metrics.observe("stage_seconds", time.perf_counter() - item["received"], stage="end_to_end")
+    
+    async def _check_comment_moderation(
+        self,
+        username: str,
+        comment_text: str,
+        verdict: Optional[asyncio.Future] = None,
+        unique_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        received: Optional[float] = None,
+        notify: bool = True
+    ):
+        """Check comment for policy violations using OpenAI moderation."""
+        try:
+            if verdict is None:
+                verdict = self.hub.moderate(unique_id or username, comment_text)
+            # The verdict may be shared with identical comments of other
+            # workers, so cancelling this one must not cancel it
+            with metrics.time("stage_seconds", stage="moderation"):
+                result = await asyncio.shield(verdict)
+            
+            if self.hub.events is not None:
+                self.hub.events.record(
+                    self.channel,
+                    unique_id or username,
+                    username,
+                    comment_text,
+                    result,
+                    time.perf_counter() - received if received is not None else None
+                )
+            
+            if result.flagged:
+                metrics.inc("flagged_total")
+                # Extract flagged categories and their scores
+                categories = result.categories
+                scores = result.category_scores
+
+                #count the number of problematic messages already sent by the user
+                offender_id = unique_id or username
+                count = self.all_allPersons.count(offender_id)
+                if count != 0:
+                    print(f"L'utilisateur {username} a dit {count} messages problematiques")
+                
+                timestamp = self._get_timestamp()
+                print(f"\033[31m{username}: {comment_text}\033[0m")  # Affichage du commentaire en rouge
+                reasons = []
+                flagged_scores = {}
+                
+                for category in categories.__dict__:
+                    if getattr(categories, category):
+                        score = getattr(scores, category)
+                        flagged_scores[category] = score
+                        reasons.append(f"{category} (score: {score:.1f})")
+                        print(f"  {category}: {score:.3f}")
+                
+                self.all_allPersons.record(
+                    offender_id,
+                    comment_text,
+                    flagged_scores,
+                    nickname=username,
+                    user_id=user_id
+                )
+                
+                # Send notification for problematic content
+                notification_title = "Message problématique détecté!"
+                notification_message = (
+                    f"{username}: {comment_text}\n"
+                    f"Raison: {', '.join(reasons)}"
+                )
+                if notify:
+                    self._send_notification(notification_message, notification_title)
+                print(f"\033[31m{username}: {comment_text}\033[0m")  # Affichage du commentaire en rouge
+                return False
+            else:
+                if not getattr(result, "degraded", False):
+                    self.hub.prefilter.remember(unique_id or username, comment_text)
+                return True
+        except Exception as e:
+            print(f"[ERROR] Moderation API error: {e}")
+    
+    def _report_flood(self, flood: Dict[str, Any], comment_text: str, unique_id: str, user_id: str) -> None:
+        """Send the aggregated alerts of a flood and record the users taking part."""
+        for title, message in flood["alerts"]:
+            metrics.inc("flood_alerts_total")
+            print(f"\033[33m[{self._get_timestamp()}] {title} {message}\033[0m")
+            self._send_notification(message, title)
+        for offender_id, nickname in flood["offenders"]:
+            self.all_allPersons.record_flood(
+                offender_id,
+                comment_text,
+                nickname=nickname,
+                user_id=user_id if offender_id == unique_id else None
+            )
+    
+    async def _process_direct_message(self, comment_list: List[Dict[str, str]]) -> None:
+        """Process messages directed to the channel owner."""
+        try:
+            # Over budget, the comments are shown as they are
+            if not self.hub.chat.budget.allows_replies(self.channel):
+                metrics.inc("budget_skipped_total", stage="read")
+                self._send_notification(
+                    "\n".join(f"{comment['username']}: {comment['message']}" for comment in comment_list),
+                    "TikTok Moderator - New Direct Message",
+                    lane="notice"
+                )
+                return
+            
+            user_prompt = self._format_comment_list_prompt(comment_list)
+            
+            response = await self.hub.chat.complete(
+                self.reader_prompt, user_prompt, room=self.channel, stage="read"
+            )
+            timestamp = self._get_timestamp()
+            print(f"[{timestamp}] AI response: {response}")
+            
+            # Skip notifications for generic acknowledgments
+            if response.lower() in ["ok", "ok."]:
+                return
+            
+            # Send notification with AI's interpretation
+            self._send_notification(
+                response, 
+                "TikTok Moderator - New Direct Message",
+                lane="notice"
+            )
+            
+        
+        except Exception as e:
+            metrics.inc("api_errors_total", endpoint="chat")
+            print(f"[ERROR] Error processing direct message: {e}")
+    
+    async def _respond(self, new_comments: List[Dict[str, Any]]) -> None:
+        """Answer a batch of triggered comments with the history preceding them."""
+        await self._generate_response(
+            new_comments,
+            self.all_comments.context(
+                before_seq=new_comments[0]["seq"],
+                max_tokens=self.hub.chat.budget.history_tokens(self.channel, self.all_comments.max_tokens)
+            )
+        )
+    
+    async def _generate_response(
+        self,
+        new_comments: List[Dict[str, str]],
+        context: Optional[List[str]] = None
+    ) -> None:
+        """Generate AI response to comments."""
+        try:
+            if context is None:
+                context = self.all_comments.context(
+                    before_seq=self.all_comments.next_seq - len(new_comments),
+                    max_tokens=self.hub.chat.budget.history_tokens(self.channel, self.all_comments.max_tokens)
+                )
+            
+            # Format prompt with context of previous comments
+            user_prompt = "Voici les anciens commentaires du chat :\n" + "".join(context)
+            
+            user_prompt += "Voici les nouveaux commentaires :\n"
+            for comment in new_comments:
+                user_prompt += f"{comment['username']}: {comment['message']}\n"
+            
+            user_prompt += "Maintenant, tu vas répondre aux nouveaux commentaires"
+            
+            # Recurring questions reuse the reply given to a similar one
+            cache = self.hub.reply_cache if len(new_comments) == 1 else None
+            question = self.router.strip(new_comments[-1]['message'])
+            cached = cache.get(question, new_comments[-1]['username']) if cache else None
+            
+            # Cached replies are free, new ones stop once the budget is spent
+            if cached is None and not self.hub.chat.budget.allows_replies(self.channel):
+                metrics.inc("budget_skipped_total", stage="reply")
+                return
+            
+            # Post each chunk of a streamed reply as soon as it is complete
+            # instead of waiting for the whole answer. Other replies are
+            # known at once, so their chunks are held to number them exactly.
+            post_reply = new_comments[-1]['username'] != "SamLePirate"
+            streamed = cached is None and self.hub.chat.streaming
+            reply_id = next(self.hub._reply_ids)
+            chunker = ReplyChunker(max_chars=100)
+            response = ""
+            posted = 0
+            held = []
+            stream = self._replay(cached) if cached is not None else self.hub.chat.stream(
+                SYSTEM_PROMPT_RESPONDER, user_prompt, room=self.channel, stage="reply"
+            )
+            async for text in stream:
+                response += text
+                for chunk in chunker.feed(text):
+                    if not streamed:
+                        held.append(chunk)
+                        continue
+                    posted += 1
+                    if post_reply:
+                        self._post_reply_chunk(chunk, reply_id, posted)
+            
+            if posted == 0 and response.strip().lower() in ["ok", "ok."]:
+                return
+            
+            if cache and cached is None:
+                cache.put(question, new_comments[-1]['username'], response)
+            
+            held += chunker.finish()
+            total = posted + len(held)
+            for chunk in held:
+                posted += 1
+                if post_reply:
+                    self._post_reply_chunk(chunk, reply_id, posted, total)
+            
+            timestamp = self._get_timestamp()
+            print(f"[{timestamp}] Suggested response: {response}")
+        
+        except Exception as e:
+            metrics.inc("api_errors_total", endpoint="chat")
+            print(f"[ERROR] Error generating response: {e}")
+    
+    @staticmethod
+    async def _replay(response: str) -> AsyncIterator[str]:
+        """Yield a cached reply like a streamed one."""
+        yield response
+    
+    def _post_reply_chunk(self, chunk: str, reply_id: int, index: int, total: Optional[int] = None) -> None:
+        """Queue a reply chunk for the chat, numbered "index/total" ("index/…" while streaming)."""
+        numbered = f"{chunk}{index}/{total if total is not None else '…'}"
+        self.hub.output.put("reply", numbered, room=self.channel, reply=reply_id)
+    
+    @staticmethod
+    def _format_comment_list_prompt(comment_list: List[Dict[str, str]]) -> str:
+        """Format comments into a prompt string."""
+        prompt = ""
+        for comment in comment_list:
+            prompt += f"{comment['username']}: {comment['message']}\n"
+        prompt += "Maintenant, tu vas dire les nouveaux commentaires."
+        return prompt
+    
+    def _send_notification(self, message: str, title: str, lane: str = "alert") -> None:
+        """Queue a notification; moderation alerts are sent before other messages."""
+        self.hub.output.put(lane, message, title=title, room=self.channel)
+    
+    def run(self) -> None:
+        """Run the TikTok live client, along with the other rooms of its hub."""
+        self.hub.run()
+    
+    def print_stats(self) -> None:
+        """Print moderation call statistics."""
+        self.hub.print_stats()
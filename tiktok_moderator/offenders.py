@@ -0,0 +1,220 @@
+"""Registry of users whose comments were flagged."""
+
+import sqlite3
+import time
+from collections import deque, Counter
+from contextlib import closing
+from typing import Dict, Any, Optional
+
+class OffenderRegistry:
+    """Per-user record of flagged comments with O(1) lookups.
+
+    Each offender keeps a count of flagged comments, a breakdown by
+    category, the last few offending messages and a score that decays
+    over time. Floods are counted apart: they raise the score but do not
+    count towards being saved. Offenders can be loaded from and saved to
+    the ``undesirables`` table shared with the Node.js app.
+    """
+
+    def __init__(self, recent_size: int = 5, half_life: float = 3600):
+        """
+        Initialize the registry.
+
+        Args:
+            recent_size: Number of offending messages kept per user
+            half_life: Time for an offender's score to halve, in seconds
+        """
+        self.recent_size = recent_size
+        self.half_life = half_life
+        self._offenders: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._offenders)
+
+    def __contains__(self, user: str) -> bool:
+        return user in self._offenders
+
+    def _get(self, user: str, nickname: Optional[str] = None) -> Dict[str, Any]:
+        """Return the record of a user, creating it if needed."""
+        offender = self._offenders.get(user)
+        if offender is None:
+            offender = {
+                "nickname": nickname or user,
+                "user_id": None,
+                "count": 0,
+                "floods": 0,
+                "categories": Counter(),
+                "recent": deque(maxlen=self.recent_size),
+                "score": 0.0,
+                "updated": time.time(),
+                "undesirable": None,
+                "announced": False,
+            }
+            self._offenders[user] = offender
+        return offender
+
+    def _decayed_score(self, offender: Dict[str, Any], now: float) -> float:
+        """Score of an offender after decay up to now."""
+        elapsed = max(0.0, now - offender["updated"])
+        return offender["score"] * 0.5 ** (elapsed / self.half_life)
+
+    def count(self, user: str) -> int:
+        """Number of flagged comments recorded for a user."""
+        offender = self._offenders.get(user)
+        return offender["count"] if offender else 0
+
+    def score(self, user: str) -> float:
+        """Current time-decayed score of a user."""
+        offender = self._offenders.get(user)
+        return self._decayed_score(offender, time.time()) if offender else 0.0
+
+    def record(
+        self,
+        user: str,
+        comment_text: str,
+        scores: Dict[str, float],
+        nickname: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Record a flagged comment.
+
+        Args:
+            user: Unique id of the author
+            comment_text: Offending comment
+            scores: Flagged categories and their scores
+            nickname: Display name of the author
+            user_id: Numeric TikTok id of the author
+
+        Returns:
+            The updated offender record
+        """
+        now = time.time()
+        offender = self._get(user, nickname)
+        if nickname:
+            offender["nickname"] = nickname
+        if user_id:
+            offender["user_id"] = user_id
+        offender["count"] += 1
+        offender["categories"].update(scores.keys())
+        offender["recent"].append(comment_text)
+        offender["score"] = self._decayed_score(offender, now) + max(scores.values(), default=1.0)
+        offender["updated"] = now
+        return offender
+
+    def record_flood(
+        self,
+        user: str,
+        comment_text: str,
+        nickname: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Record a flood a user took part in.
+
+        Floods (a fast viewer, a popular copy-paste) are not flagged
+        comments, so they are kept out of the count that gets offenders
+        saved as undesirables.
+
+        Args:
+            user: Unique id of the author
+            comment_text: Comment that was part of the flood
+            nickname: Display name of the author
+            user_id: Numeric TikTok id of the author
+
+        Returns:
+            The updated offender record
+        """
+        now = time.time()
+        offender = self._get(user, nickname)
+        if nickname:
+            offender["nickname"] = nickname
+        if user_id:
+            offender["user_id"] = user_id
+        offender["floods"] += 1
+        offender["recent"].append(comment_text)
+        offender["score"] = self._decayed_score(offender, now) + 0.5
+        offender["updated"] = now
+        return offender
+
+    def floods(self, user: str) -> int:
+        """Number of floods recorded for a user."""
+        offender = self._offenders.get(user)
+        return offender["floods"] if offender else 0
+
+    def announce(self, user: str) -> Optional[str]:
+        """Return the stored reason the first time a known undesirable shows up."""
+        offender = self._offenders.get(user)
+        if offender is None or offender["undesirable"] is None or offender["announced"]:
+            return None
+        offender["announced"] = True
+        return offender["undesirable"]
+
+    def load(self, db_path: str) -> int:
+        """
+        Load the undesirables saved by previous sessions.
+
+        Args:
+            db_path: Path of the SQLite database used by the Node.js app
+
+        Returns:
+            Number of undesirables loaded
+        """
+        try:
+            with closing(sqlite3.connect(db_path)) as db:
+                rows = db.execute(
+                    "SELECT u.uniqueId, u.nickname, u.userId, ud.reason "
+                    "FROM undesirables ud JOIN users u ON u.id = ud.user_id"
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to load undesirables: {e}")
+            return 0
+        for unique_id, nickname, user_id, reason in rows:
+            offender = self._get(unique_id, nickname)
+            offender["user_id"] = user_id
+            offender["undesirable"] = reason or ""
+        return len(rows)
+
+    def save(self, db_path: str, min_count: int = 3) -> int:
+        """
+        Save repeat offenders to the undesirables table.
+
+        Like db.js, the friends and undesirables lists are kept apart:
+        friends the host whitelisted are never saved as undesirables.
+
+        Args:
+            db_path: Path of the SQLite database used by the Node.js app
+            min_count: Number of flagged comments needed to be saved
+
+        Returns:
+            Number of new undesirables saved
+        """
+        saved = 0
+        try:
+            with closing(sqlite3.connect(db_path)) as db, db:
+                for unique_id, offender in self._offenders.items():
+                    if offender["undesirable"] is not None or offender["count"] < min_count:
+                        continue
+                    if db.execute(
+                        "SELECT 1 FROM friends f JOIN users u ON u.id = f.user_id WHERE u.uniqueId = ?",
+                        (unique_id,)
+                    ).fetchone():
+                        continue
+                    reason = "Modération: " + ", ".join(
+                        f"{category} x{count}"
+                        for category, count in offender["categories"].most_common()
+                    )
+                    db.execute(
+                        "INSERT OR IGNORE INTO users (userId, uniqueId, nickname) VALUES (?, ?, ?)",
+                        (offender["user_id"] or unique_id, unique_id, offender["nickname"])
+                    )
+                    db.execute(
+                        "INSERT OR IGNORE INTO undesirables (uniqueId, user_id, reason) "
+                        "SELECT uniqueId, id, ? FROM users WHERE uniqueId = ?",
+                        (reason, unique_id)
+                    )
+                    offender["undesirable"] = reason
+                    saved += 1
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to save undesirables: {e}")
+        return saved
@@ -0,0 +1,275 @@
+"""Output queue sending alerts, notices and replies through pluggable sinks.
+
+The macOS notification and GUI typing sinks import pync, pyperclip and
+pyautogui when they are created, so headless setups never load them.
+"""
+
+import json
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+
+from .api import TokenBucket
+from .metrics import metrics
+
+
+class NotificationSink:
+    """Shows alerts and notices as macOS notifications."""
+
+    lanes = {"alert", "notice"}
+
+    def __init__(self):
+        import pync  # macOS only
+        self._pync = pync
+
+    def send(self, message: Dict[str, Any]) -> None:
+        with metrics.time("stage_seconds", stage="notification"):
+            self._pync.notify(
+                message["text"],
+                title=message["title"],
+                sound="Ping",
+                appIcon="",
+                contentImage="",
+                activate="com.apple.Terminal"
+            )
+
+
+class TyperSink:
+    """Types replies in the focused TikTok chat window."""
+
+    lanes = {"reply"}
+
+    def __init__(self):
+        # pyautogui needs a display as soon as it is imported
+        import pyautogui
+        import pyperclip
+        self._pyautogui = pyautogui
+        self._pyperclip = pyperclip
+
+    def send(self, message: Dict[str, Any]) -> None:
+        self._pyperclip.copy(message["text"])
+        self._pyautogui.hotkey('command', 'v')
+        self._pyautogui.press('enter')
+
+
+class StdoutSink:
+    """Prints every message, for dry runs and headless use."""
+
+    lanes = {"alert", "notice", "reply"}
+
+    def send(self, message: Dict[str, Any]) -> None:
+        title = f"{message['title']}: " if message["title"] else ""
+        print(f"[{message['lane'].upper()}] {title}{message['text']}")
+
+
+class FileSink:
+    """Appends every message to a JSONL file."""
+
+    lanes = {"alert", "notice", "reply"}
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, message: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """Posts every message as JSON, e.g. to server.js /api/moderator/events."""
+
+    lanes = {"alert", "notice", "reply"}
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, message: Dict[str, Any]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(message).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def create_sink(spec: str) -> Any:
+    """
+    Create an output sink from its command line description.
+
+    Args:
+        spec: "notify", "type", "stdout", "file:PATH" or "webhook:URL"
+    """
+    kind, _, target = spec.partition(":")
+    if kind == "notify":
+        return NotificationSink()
+    if kind == "type":
+        return TyperSink()
+    if kind == "stdout":
+        return StdoutSink()
+    if kind == "file" and target:
+        return FileSink(target)
+    if kind == "webhook" and target:
+        return WebhookSink(target)
+    raise ValueError(f"Unknown output: {spec}")
+
+
+def default_sinks(dry_run: bool = False, headless: bool = False, typing: bool = True) -> List[Any]:
+    """
+    Create the sinks used when no output is configured.
+
+    Args:
+        dry_run: Print messages instead of sending and typing them
+        headless: No desktop is available (e.g. in Docker), print messages
+        typing: Type replies in the focused chat window, which can only
+            be the chat of a single room
+    """
+    if dry_run or headless:
+        return [StdoutSink()]
+    return [NotificationSink(), TyperSink()] if typing else [NotificationSink()]
+
+
+class OutputQueue:
+    """Sends alerts, notices and replies from a dedicated thread.
+
+    Sinks (notifications, GUI typing, webhooks...) may block, so they never
+    run on the event loop. Messages are served by priority lane: moderation
+    alerts first, then notices, both sent right away, then chat replies,
+    rate limited by a token bucket at the typing pace. Identical pending alerts are coalesced, and replies that
+    waited too long, or overflow the reply lane, are dropped whole.
+    """
+
+    LANES = ("alert", "notice", "reply")
+
+    def __init__(
+        self,
+        sinks: List[Any],
+        rate: float = 1 / 1.5,
+        burst: int = 1,
+        max_age: float = 30.0,
+        max_pending: int = 50
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            sinks: Objects with a set of "lanes" and a send(message) method
+            rate: Maximum number of reply chunks sent per second
+            burst: Number of reply chunks that can be sent back to back
+            max_age: Age after which a reply that has not started is dropped, in seconds
+            max_pending: Maximum number of pending reply chunks
+        """
+        self.sinks = sinks
+        self.bucket = TokenBucket(rate, burst)
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self._lanes: Dict[str, deque] = {lane: deque() for lane in self.LANES}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._current_reply = None
+        self._thread = threading.Thread(target=self._run, name="output", daemon=True)
+        self._thread.start()
+        metrics.gauge("output_pending", self.pending)
+
+    def pending(self) -> int:
+        """Number of messages waiting to be sent."""
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def put(self, lane: str, text: str, title: str = "", room: str = "", reply: Optional[int] = None) -> None:
+        """
+        Queue a message without blocking.
+
+        Args:
+            lane: One of LANES
+            text: Message text
+            title: Notification title
+            room: Channel the message relates to
+            reply: Id shared by the chunks of one reply
+        """
+        message = {
+            "lane": lane,
+            "title": title,
+            "text": text,
+            "room": room,
+            "reply": reply,
+            "created": time.time(),
+        }
+        with self._condition:
+            queue = self._lanes[lane]
+            if lane == "alert" and any(
+                pending["text"] == text and pending["title"] == title for pending in queue
+            ):
+                metrics.inc("output_total", lane=lane, outcome="coalesced")
+                return
+            queue.append(message)
+            # Make room by dropping the oldest reply, whole
+            while lane == "reply" and len(queue) > self.max_pending:
+                self._drop_reply(queue, queue[0]["reply"])
+            self._condition.notify()
+
+    @staticmethod
+    def _drop_reply(queue: deque, reply: Optional[int]) -> None:
+        """Remove the pending chunks of a reply."""
+        kept = [message for message in queue if message["reply"] != reply]
+        metrics.inc("output_total", len(queue) - len(kept), lane="reply", outcome="dropped")
+        queue.clear()
+        queue.extend(kept)
+
+    def _next(self, lanes: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """Pop the next message to send from lanes, by priority."""
+        for lane in lanes:
+            queue = self._lanes[lane]
+            while queue:
+                message = queue[0]
+                # Replies already being posted are finished, others expire
+                if (
+                    lane == "reply"
+                    and message["reply"] != self._current_reply
+                    and time.time() - message["created"] > self.max_age
+                ):
+                    self._drop_reply(queue, message["reply"])
+                    continue
+                if lane == "reply":
+                    self._current_reply = message["reply"]
+                return queue.popleft()
+        return None
+
+    def _run(self) -> None:
+        """Send messages until the queue is closed and empty."""
+        while True:
+            with self._condition:
+                while not self._closed and not self.pending():
+                    self._condition.wait()
+                if self._closed and not self.pending():
+                    return
+                # Alerts and notices are not held back by the typing pace
+                message = self._next(("alert", "notice"))
+                if message is None:
+                    delay = self.bucket.delay()
+                    if delay > 0:
+                        self._condition.wait(delay)
+                        continue
+                    message = self._next(("reply",))
+                    if message is None:
+                        continue
+                    self.bucket.take()
+
+            for sink in self.sinks:
+                if message["lane"] not in sink.lanes:
+                    continue
+                try:
+                    sink.send(message)
+                except Exception as e:
+                    print(f"[ERROR] Failed to send {message['lane']} to {type(sink).__name__}: {e}")
+            metrics.inc("output_total", lane=message["lane"], outcome="sent")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Send what is still pending, for up to timeout seconds, then stop."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
@@ -0,0 +1,250 @@
+"""Worker pool processing comments, and scheduling of AI replies."""
+
+import asyncio
+import random
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+from .metrics import metrics
+from .verdicts import VerdictCache
+
+class CommentPipeline:
+    """Bounded worker pool processing comments off the ingestion path.
+
+    Comments are sharded by room and user unique id (nicknames are not
+    unique) so that a given user's comments are always handled by the
+    same worker, in arrival order. Each worker keeps one queue per room
+    and serves rooms in turn, so a busy or slow room cannot starve the
+    others. When a room's queue is full, the
+    backpressure policy decides what happens to new comments:
+
+    - ``drop``: the new comment is discarded.
+    - ``coalesce``: the new comment is merged into a comment from the same
+      user that is still waiting in the shard (dropped if there is none).
+    - ``spill``: the new comment goes to an unbounded overflow queue that is
+      drained back into the shard as the worker catches up.
+    """
+
+    BACKPRESSURE_POLICIES = ("drop", "coalesce", "spill")
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        workers: int = 4,
+        queue_size: int = 100,
+        policy: str = "spill"
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            handler: Coroutine function called for each queued comment
+            workers: Number of concurrent workers
+            queue_size: Maximum number of pending comments per worker and room
+            policy: Backpressure policy, one of BACKPRESSURE_POLICIES
+        """
+        if policy not in self.BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self._shards: List[Dict[str, deque]] = [{} for _ in range(self.workers)]
+        self._spills: List[Dict[str, deque]] = [{} for _ in range(self.workers)]
+        # Rooms with pending comments, in the order workers serve them
+        self._ready: List[deque] = [deque() for _ in range(self.workers)]
+        self._wakeups: List[asyncio.Event] = []
+        self._tasks: List[asyncio.Task] = []
+        self.dropped = 0
+        self.coalesced = 0
+        self.spilled = 0
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        if self._tasks:
+            return
+        self._wakeups = [asyncio.Event() for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(index))
+            for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the workers, abandoning pending comments."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def pending(self) -> int:
+        """Return the number of comments waiting to be processed."""
+        return sum(
+            len(queue)
+            for shards in (self._shards, self._spills)
+            for rooms in shards
+            for queue in rooms.values()
+        )
+
+    def submit(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Queue a comment without blocking.
+
+        Args:
+            item: Comment work item, must contain "username" and "message",
+                "unique_id" when known and "room" when several rooms share
+                the pipeline
+
+        Returns:
+            The queued work item holding the comment (item itself, or the
+            pending one it was merged into), None if it was dropped
+        """
+        self.start()
+        room = item.get("room", "")
+        index = hash((room, self._user(item))) % self.workers
+        shard = self._shards[index].setdefault(room, deque())
+        spill = self._spills[index].setdefault(room, deque())
+        if not shard:
+            self._ready[index].append(room)
+
+        queued = None
+        # Once a shard has spilled, later comments must queue behind the
+        # spilled ones to keep per-user ordering.
+        if len(shard) < self.queue_size and not spill:
+            shard.append(item)
+            queued = item
+        elif self.policy == "spill":
+            spill.append(item)
+            self.spilled += 1
+            queued = item
+        elif self.policy == "coalesce":
+            queued = self._coalesce(shard, item)
+            if queued is not None:
+                self.coalesced += 1
+        if queued is None:
+            self.dropped += 1
+            print(f"[WARN] Queue full, dropped comment from {item['username']}")
+            return None
+
+        self._wakeups[index].set()
+        return queued
+
+    @staticmethod
+    def _user(item: Dict[str, Any]) -> str:
+        """Return the unique id of the author of a comment."""
+        return item.get("unique_id") or item["username"]
+
+    @classmethod
+    def _coalesce(cls, shard: deque, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge item into the newest pending comment from the same user, returning it."""
+        for pending in reversed(shard):
+            if cls._user(pending) == cls._user(item):
+                pending["message"] += "\n" + item["message"]
+                return pending
+        return None
+
+    async def _worker(self, index: int) -> None:
+        """Process the comments of one shard, in order, one room at a time."""
+        ready = self._ready[index]
+        wakeup = self._wakeups[index]
+        while True:
+            if not ready:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            room = ready.popleft()
+            shard = self._shards[index][room]
+            spill = self._spills[index][room]
+            item = shard.popleft()
+            while spill and len(shard) < self.queue_size:
+                shard.append(spill.popleft())
+            if shard:
+                ready.append(room)
+            try:
+                await self.handler(item)
+            except Exception as e:
+                print(f"[ERROR] Error in comment worker: {e}")
+
+
+class ReplyScheduler:
+    """Coalesces the comments that trigger an AI reply into one completion.
+
+    Triggered comments are collected for up to ``window_ms`` milliseconds,
+    and for as long as the previous reply of the room is still being
+    generated, then answered together. Near-identical comments are only
+    answered once, and when more than ``max_comments`` pile up during a
+    raid, a uniform sample of them is kept (reservoir sampling) so the
+    prompt stays small.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        window_ms: int = 1500,
+        max_comments: int = 5
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            respond: Coroutine function answering a list of comments
+            window_ms: Time to collect triggered comments, in milliseconds
+            max_comments: Maximum number of comments answered in one reply
+        """
+        self.respond = respond
+        self.window = max(0, window_ms) / 1000
+        self.max_comments = max(1, max_comments)
+        self._pending: List[Dict[str, Any]] = []
+        self._keys = set()
+        self._seen = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, comment: Dict[str, Any]) -> None:
+        """Queue a triggered comment for the next reply."""
+        key = VerdictCache.normalize(comment["message"])
+        if key in self._keys:
+            metrics.inc("reply_comments_total", outcome="deduped")
+            return
+        self._keys.add(key)
+        self._seen += 1
+        if len(self._pending) < self.max_comments:
+            self._pending.append(comment)
+        else:
+            # Each comment of the burst has the same chance to be answered
+            index = random.randrange(self._seen)
+            if index < self.max_comments:
+                self._pending[index] = comment
+            metrics.inc("reply_comments_total", outcome="sampled_out")
+        if self._flush_handle is None and self._task is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _flush(self) -> None:
+        """Answer the pending comments unless a reply is still running."""
+        self._flush_handle = None
+        if self._task is not None or not self._pending:
+            return
+        batch = sorted(self._pending, key=lambda comment: comment["seq"])
+        self._pending, self._keys, self._seen = [], set(), 0
+        metrics.inc("reply_comments_total", len(batch), outcome="answered")
+        self._task = asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Dict[str, Any]]) -> None:
+        """Generate one reply, then answer what arrived meanwhile."""
+        try:
+            with metrics.time("stage_seconds", stage="reply"):
+                await self.respond(batch)
+        finally:
+            self._task = None
+            if self._pending:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def idle(self) -> bool:
+        """Whether no comment is waiting for or being answered."""
+        return not self._pending and self._task is None
+
+    def close(self) -> None:
+        """Drop the pending comments."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending, self._keys, self._seen = [], set(), 0
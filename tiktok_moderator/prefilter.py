@@ -0,0 +1,183 @@
+"""Local pre-filter deciding which comments need a remote moderation call."""
+
+import unicodedata
+from collections import deque, OrderedDict
+from typing import List, Dict, Any, Optional
+
+from .verdicts import make_moderation_result
+
+# Short messages that never need a remote moderation call
+GREETING_WORDS = {
+    "bonjour", "bonsoir", "salut", "slt", "coucou", "cc", "bjr", "hello",
+    "hi", "hey", "yo", "merci", "mrc", "lol", "mdr", "ptdr", "first",
+    "premier", "premiere", "bravo", "top", "ok", "oui", "non",
+}
+# Words allowed after a greeting ("bonjour à tous", "salut tout le monde")
+GREETING_FILLERS = {
+    "à", "a", "tous", "tout", "toutes", "le", "la", "les", "monde", "toi",
+    "vous", "sam", "beaucoup", "everyone", "all",
+}
+MAX_GREETING_WORDS = 4
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher, built once and reused for every comment."""
+
+    def __init__(self, patterns: List[str]):
+        """
+        Build the automaton.
+
+        Args:
+            patterns: Terms to look for (matched case-insensitively)
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self.size = 0
+
+        for pattern in patterns:
+            pattern = pattern.strip().casefold()
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append(len(pattern))
+            self.size += 1
+
+        # Breadth-first computation of the failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str, whole_words: bool = True) -> Optional[str]:
+        """
+        Return the first pattern found in text, or None.
+
+        Args:
+            text: Casefolded text to search
+            whole_words: Ignore matches that are part of a longer word
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length in out[state]:
+                start = end - length
+                if whole_words and (
+                    (start > 0 and text[start - 1].isalnum())
+                    or (end < len(text) and text[end].isalnum())
+                ):
+                    continue
+                return text[start:end]
+        return None
+
+
+class CommentPreFilter:
+    """Local first moderation tier, run before the remote moderation API.
+
+    Comments hitting the blocklist are flagged locally, trivially safe
+    comments (emoji only, short greetings, messages the same user already
+    sent) are accepted locally, and only the remaining ones are escalated.
+    """
+
+    def __init__(self, blocklist: Optional[List[str]] = None, memory_size: int = 10000):
+        """
+        Initialize the pre-filter.
+
+        Args:
+            blocklist: Terms that flag a comment without calling the API
+            memory_size: Number of already accepted (user, message) pairs to remember
+        """
+        self.matcher = AhoCorasick(blocklist or [])
+        self.memory_size = memory_size
+        self._accepted: OrderedDict = OrderedDict()
+        self.stats = {"blocked": 0, "emoji": 0, "greeting": 0, "repeat": 0, "escalated": 0}
+
+    @staticmethod
+    def load_blocklist(path: str) -> List[str]:
+        """Read one blocklist term per line, ignoring blank lines and # comments."""
+        with open(path, encoding="utf-8") as f:
+            return [
+                line.strip() for line in f
+                if line.strip() and not line.lstrip().startswith("#")
+            ]
+
+    @staticmethod
+    def _is_emoji_only(text: str) -> bool:
+        """Whether text only contains symbols, punctuation and spaces."""
+        return all(
+            unicodedata.category(char)[0] in "SPZ" or char in "\u200d\ufe0f"
+            for char in text
+        )
+
+    @staticmethod
+    def _is_greeting(normalized: str) -> bool:
+        """Whether text is a short greeting such as "bonjour à tous"."""
+        words = "".join(
+            char if char.isalnum() else " " for char in normalized
+        ).split()
+        return (
+            0 < len(words) <= MAX_GREETING_WORDS
+            and words[0] in GREETING_WORDS
+            and all(word in GREETING_WORDS or word in GREETING_FILLERS for word in words)
+        )
+
+    def check(self, user: str, comment_text: str) -> Optional[Any]:
+        """
+        Classify a comment locally.
+
+        Args:
+            user: Unique id of the author, nicknames are not unique
+            comment_text: Comment to classify
+
+        Returns:
+            A moderation result shaped like the API's, or None when the
+            comment has to be escalated to the remote API
+        """
+        normalized = comment_text.strip().casefold()
+
+        term = self.matcher.find(normalized) if self.matcher.size else None
+        if term is not None:
+            self.stats["blocked"] += 1
+            return make_moderation_result({"blocklist": 1.0})
+
+        if self._is_emoji_only(normalized):
+            reason = "emoji"
+        elif self._is_greeting(normalized):
+            reason = "greeting"
+        elif (user, normalized) in self._accepted:
+            self._accepted.move_to_end((user, normalized))
+            reason = "repeat"
+        else:
+            self.stats["escalated"] += 1
+            return None
+
+        self.stats[reason] += 1
+        return make_moderation_result({})
+
+    def remember(self, user: str, comment_text: str) -> None:
+        """Record a comment the remote API accepted from a user (unique id), to skip it next time."""
+        key = (user, comment_text.strip().casefold())
+        self._accepted[key] = True
+        self._accepted.move_to_end(key)
+        if len(self._accepted) > self.memory_size:
+            self._accepted.popitem(last=False)
+
+    def saved_calls(self) -> int:
+        """Number of comments decided locally instead of by the API."""
+        return sum(count for reason, count in self.stats.items() if reason != "escalated")
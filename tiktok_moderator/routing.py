@@ -0,0 +1,85 @@
+"""Routing of the comments addressed to the host."""
+
+import json
+import re
+from typing import List, Dict, Any, Optional
+
+# Routing of comments addressed to the host, first matching route wins.
+# Same shape as the JSON file given with --routes.
+DEFAULT_ROUTES = [
+    {"name": "direct", "regexes": [r"^\s*@SamLePirate\b"], "action": "read"},
+    {"name": "mention", "handles": ["@SamLePirate"], "keywords": ["Gentil Robot"], "action": "reply"},
+]
+
+
+class TriggerRouter:
+    """Classifies comments against a table of routes in a single pass.
+
+    Each route matches mention handles, keywords and regexes,
+    case-insensitively and anywhere in the comment, and has an action:
+    "read" (summarize it for the host), "reply" (answer it in the chat),
+    "alert" (notify the host) or "ignore". All routes are compiled into
+    one regex with a named group per route, so the cost of routing a
+    comment does not grow with the number of triggers. When several
+    routes match, the first one of the table wins.
+    """
+
+    ACTIONS = ("read", "reply", "alert", "ignore")
+
+    def __init__(self, routes: List[Dict[str, Any]]):
+        """
+        Compile the routes.
+
+        Args:
+            routes: Route dicts with a name, an action and optional
+                handles, keywords, regexes and rooms lists
+        """
+        self.routes = routes
+        alternatives = []
+        for index, route in enumerate(routes):
+            if route.get("action") not in self.ACTIONS:
+                raise ValueError(f"Route {route.get('name', index)}: action must be one of {', '.join(self.ACTIONS)}")
+            terms = [
+                r"(?<!\w)" + r"\s+".join(re.escape(word) for word in term.split()) + r"(?!\w)"
+                for term in route.get("handles", []) + route.get("keywords", [])
+            ] + [f"(?:{regex})" for regex in route.get("regexes", [])]
+            if terms:
+                alternatives.append(f"(?P<r{index}>{'|'.join(terms)})")
+        self._pattern = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+    @classmethod
+    def for_room(cls, routes: List[Dict[str, Any]], channel: str) -> "TriggerRouter":
+        """Build the router of a room from the routes without rooms or listing it."""
+        channel = channel.lower()
+        return cls([
+            route for route in routes
+            if not route.get("rooms") or channel in (room.lower() for room in route["rooms"])
+        ])
+
+    @staticmethod
+    def load(path: str) -> List[Dict[str, Any]]:
+        """Read the routes of a JSON file, a list of route dicts."""
+        with open(path, encoding="utf-8") as f:
+            routes = json.load(f)
+        TriggerRouter(routes)  # Fail at startup on invalid routes
+        return routes
+
+    def route(self, comment_text: str) -> Optional[Dict[str, Any]]:
+        """Return the first route matching a comment, or None."""
+        if self._pattern is None:
+            return None
+        best = None
+        for match in self._pattern.finditer(comment_text):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if index == 0:
+                    break
+        return self.routes[best] if best is not None else None
+
+    def strip(self, comment_text: str) -> str:
+        """Remove every trigger of the routes from a comment, keeping the rest."""
+        if self._pattern is not None:
+            comment_text = self._pattern.sub(" ", comment_text)
+        # "Gentil Robot, tu viens d'où" leaves a leading comma
+        return " ".join(comment_text.split()).lstrip(",;:.-– ")
@@ -0,0 +1,147 @@
+"""Hashed n-gram embeddings and the similarity cache of AI replies."""
+
+import re
+import time
+import unicodedata
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Optional, Tuple
+
+from .metrics import metrics
+from .verdicts import VerdictCache
+
+
+def require_numpy(component: str) -> Any:
+    """Import numpy, which is only needed by the reply cache and the local classifier."""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(f"The {component} requires numpy (pip install numpy)") from None
+    return numpy
+
+class HashedVectorizer:
+    """Embeds texts as L2-normalized vectors of hashed character n-grams.
+
+    A cheap, dependency-free stand-in for an embedding model: good enough
+    to match rephrased or misspelled versions of the same short question.
+    """
+
+    def __init__(self, dim: int = 4096, ngram_sizes: Tuple[int, ...] = (3, 4)):
+        """
+        Initialize the vectorizer.
+
+        Args:
+            dim: Vector size, n-grams are hashed into that many buckets
+            ngram_sizes: Lengths of the character n-grams
+        """
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def features(self, text: str) -> Tuple[Any, Any]:
+        """Return the non-zero buckets of the normalized vector of a text and their values."""
+        np = require_numpy("hashed vectorizer")
+        # "âge ?" and "age" share their n-grams
+        text = unicodedata.normalize("NFKD", VerdictCache.normalize(text))
+        text = "".join(char if char.isalnum() else " " for char in text if not unicodedata.combining(char))
+        padded = f" {' '.join(text.split())} "
+        counts = Counter(
+            # crc32 is stable across runs, unlike hash()
+            zlib.crc32(padded[i:i + size].encode()) % self.dim
+            for size in self.ngram_sizes
+            for i in range(len(padded) - size + 1)
+        )
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        norm = np.linalg.norm(values)
+        return indices, values / norm if norm else values
+
+    def vectorize(self, text: str) -> Any:
+        """Return the normalized n-gram vector of a text."""
+        np = require_numpy("hashed vectorizer")
+        vector = np.zeros(self.dim, dtype=np.float32)
+        indices, values = self.features(text)
+        vector[indices] = values
+        return vector
+
+
+class ReplyCache:
+    """LRU/TTL cache of AI replies indexed by question similarity.
+
+    Viewers keep asking the same few questions ("c'est quoi ton âge",
+    "tu viens d'où"). Questions are embedded with a HashedVectorizer and
+    kept in a NumPy matrix, so a lookup is a single matrix-vector product;
+    a question whose cosine similarity with a cached one reaches the
+    threshold reuses its reply, addressed to the new viewer.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        max_size: int = 500,
+        ttl: float = 1800,
+        vectorizer: Optional[HashedVectorizer] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for two questions to share a reply
+            max_size: Maximum number of replies kept
+            ttl: Lifetime of a reply, in seconds
+            vectorizer: Question embedder (a default HashedVectorizer if None)
+        """
+        np = require_numpy("reply cache")
+        self.threshold = threshold
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.vectorizer = vectorizer or HashedVectorizer()
+        self._matrix = np.zeros((self.max_size, self.vectorizer.dim), dtype=np.float32)
+        # Row of the matrix -> (stored_at, question, reply), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._free = list(range(self.max_size))
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self, row: int) -> None:
+        """Free a row of the matrix."""
+        del self._entries[row]
+        self._matrix[row] = 0
+        self._free.append(row)
+
+    def get(self, question: str, username: str) -> Optional[str]:
+        """Return the cached reply to a similar question, addressed to username, or None."""
+        np = require_numpy("reply cache")
+        similarities = self._matrix @ self.vectorizer.vectorize(question)
+        now = time.time()
+        for row in np.argsort(similarities)[::-1]:
+            if similarities[row] < self.threshold:
+                break
+            stored_at, _, reply = self._entries[row]
+            if now - stored_at > self.ttl:
+                self._evict(row)
+                continue
+            self._entries.move_to_end(row)
+            self.hits += 1
+            metrics.inc("reply_cache_total", outcome="hit")
+            return reply.replace("{username}", username)
+        self.misses += 1
+        metrics.inc("reply_cache_total", outcome="miss")
+        return None
+
+    def put(self, question: str, username: str, reply: str) -> None:
+        """Store the reply given to a viewer's question."""
+        if not self._free:
+            self._evict(next(iter(self._entries)))
+        row = self._free.pop()
+        self._matrix[row] = self.vectorizer.vectorize(question)
+        # Keep the reply reusable for other viewers. Only whole words are
+        # replaced, so short nicknames ("a", "le") leave other words alone.
+        template = reply
+        if username:
+            template = re.sub(rf"(?<!\w){re.escape(username)}(?!\w)", "{username}", reply)
+        self._entries[row] = (time.time(), question, template)
+
+    def hit_rate(self) -> float:
+        """Share of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,210 @@
+"""Recording of incoming comments and storage of moderation verdicts."""
+
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import List, Any, Optional, Tuple
+
+from .metrics import metrics
+from .verdicts import VerdictCache
+
+class CommentRecorder:
+    """Writes incoming comments to a JSONL log that can be replayed offline."""
+
+    def __init__(self, path: str):
+        """
+        Open the log.
+
+        Args:
+            path: JSONL file the comments are appended to
+        """
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._start = time.monotonic()
+
+    def write(self, event: Any, room: str = "") -> None:
+        """Append a TikTokLive comment event with its room and time offset since the recording started."""
+        record = {
+            "t": round(time.monotonic() - self._start, 3),
+            "room": room,
+            "nickname": event.user.nickname,
+            "unique_id": getattr(event.user, "unique_id", None),
+            "user_id": str(getattr(event.user, "id", "") or ""),
+            "comment": event.comment,
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        """Flush and close the log."""
+        self._file.close()
+
+
+class EventStore:
+    """Persists every moderation verdict to SQLite off the event loop.
+
+    Events are queued without blocking and written by a background thread
+    with ``executemany``, committing every ``batch_size`` events or
+    ``flush_interval`` seconds. The database runs in WAL mode so reports
+    (and the Node.js app) can read it while the moderator writes. Comment
+    texts are stored as a hash of their normalized form only.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS moderation_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            room TEXT NOT NULL,
+            stream TEXT NOT NULL,
+            uniqueId TEXT NOT NULL,
+            nickname TEXT,
+            text_hash TEXT NOT NULL,
+            flagged INTEGER NOT NULL,
+            categories TEXT,
+            scores TEXT,
+            latency_ms REAL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_moderation_events_flagged "
+        "ON moderation_events (flagged, created_at, uniqueId)",
+        "CREATE INDEX IF NOT EXISTS idx_moderation_events_stream "
+        "ON moderation_events (stream, flagged)",
+    )
+
+    def __init__(self, db_path: str, batch_size: int = 200, flush_interval: float = 1.0):
+        """
+        Open the store and start the writer thread.
+
+        Args:
+            db_path: SQLite database, e.g. the data/tiktok_chat.db of the Node.js app
+            batch_size: Number of events written per transaction
+            flush_interval: Maximum time an event waits to be committed, in seconds
+        """
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        # One stream per room and run of the moderator
+        self.started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.written = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        with closing(self._connect()) as db, db:
+            for statement in self.SCHEMA:
+                db.execute(statement)
+        self._thread = threading.Thread(target=self._run, name="events", daemon=True)
+        self._thread.start()
+        metrics.gauge("events_pending", self._queue.qsize)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def record(
+        self,
+        room: str,
+        unique_id: str,
+        nickname: str,
+        comment_text: str,
+        result: Any,
+        latency: Optional[float] = None
+    ) -> None:
+        """
+        Queue a verdict, without blocking.
+
+        Args:
+            room: Channel the comment was posted in
+            unique_id: TikTok unique id of the author
+            nickname: Display name of the author
+            comment_text: Moderated comment
+            result: Moderation result
+            latency: Time from reception to verdict, in seconds
+        """
+        scores = {}
+        if result.flagged:
+            for category in result.categories.__dict__:
+                if getattr(result.categories, category):
+                    scores[category] = round(getattr(result.category_scores, category), 4)
+        text_hash = hashlib.sha256(VerdictCache.normalize(comment_text).encode()).hexdigest()[:16]
+        self._queue.put((
+            time.time(),
+            room,
+            f"{room} {self.started}",
+            unique_id,
+            nickname,
+            text_hash,
+            int(bool(result.flagged)),
+            ",".join(scores) or None,
+            json.dumps(scores) if scores else None,
+            round(latency * 1000, 1) if latency is not None else None,
+        ))
+
+    def _run(self) -> None:
+        """Write queued events in batches until a None sentinel is received."""
+        db = self._connect()
+        try:
+            running = True
+            while running:
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if row is None:
+                        running = False
+                        break
+                    batch.append(row)
+                if not batch:
+                    continue
+                try:
+                    with db:
+                        db.executemany(
+                            "INSERT INTO moderation_events (created_at, room, stream, uniqueId, "
+                            "nickname, text_hash, flagged, categories, scores, latency_ms) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            batch
+                        )
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    print(f"[ERROR] Failed to write {len(batch)} moderation events: {e}")
+        finally:
+            db.close()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write the queued events and stop the writer."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def top_offenders(self, days: float = 7, limit: int = 10) -> List[Tuple[str, str, int]]:
+        """Return (uniqueId, nickname, flagged comments) of the worst offenders of the last days."""
+        with closing(self._connect()) as db:
+            return db.execute(
+                "SELECT uniqueId, MAX(nickname), COUNT(*) AS flagged_count "
+                "FROM moderation_events WHERE flagged = 1 AND created_at >= ? "
+                "GROUP BY uniqueId ORDER BY flagged_count DESC LIMIT ?",
+                (time.time() - days * 86400, limit)
+            ).fetchall()
+
+    def flag_rate_per_stream(self, limit: int = 20) -> List[Tuple[str, int, int, float]]:
+        """Return (stream, comments, flagged, flag rate) of the most recent streams."""
+        with closing(self._connect()) as db:
+            return db.execute(
+                "SELECT stream, COUNT(*), SUM(flagged), AVG(flagged) "
+                "FROM moderation_events GROUP BY stream "
+                "ORDER BY MAX(created_at) DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+    def print_report(self) -> None:
+        """Print the top offenders of the week and the flag rate of recent streams."""
+        print("Top offenders this week:")
+        for unique_id, nickname, count in self.top_offenders():
+            print(f"  {nickname or unique_id} (@{unique_id}): {count} flagged comments")
+        print("Flag rate per stream:")
+        for stream, comments, flagged, rate in self.flag_rate_per_stream():
+            print(f"  {stream}: {flagged}/{comments} flagged ({rate:.1%})")
@@ -0,0 +1,118 @@
+"""Moderation results and the cache of moderation verdicts."""
+
+import json
+import time
+import types
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+# Variation selectors, skin tones and joiners ignored when comparing comments
+EMOJI_VARIANTS = {"\ufe0e", "\ufe0f", "\u200d"} | {chr(code) for code in range(0x1F3FB, 0x1F400)}
+
+
+def make_moderation_result(scores: Dict[str, float]) -> Any:
+    """Build an object shaped like an OpenAI moderation result from flagged category scores."""
+    return types.SimpleNamespace(
+        flagged=bool(scores),
+        categories=types.SimpleNamespace(**{category: True for category in scores}),
+        category_scores=types.SimpleNamespace(**scores),
+    )
+
+
+class VerdictCache:
+    """LRU/TTL cache of moderation verdicts keyed on normalized comment text.
+
+    Copy-paste raids and repeated comments are answered from the cache
+    instead of paying a moderation round-trip. Entries only keep the
+    flagged categories and their scores, and can be saved to a JSON file
+    to survive restarts.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600, path: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of verdicts kept
+            ttl: Lifetime of a verdict, in seconds
+            path: JSON file the cache is loaded from and saved to
+        """
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.path = path
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    @staticmethod
+    def normalize(comment_text: str) -> str:
+        """Casefold, drop emoji variants and collapse whitespace and repeated letters."""
+        text = unicodedata.normalize("NFKC", comment_text).casefold()
+        text = "".join(char for char in text if char not in EMOJI_VARIANTS)
+        text = " ".join(text.split())
+        # "loooool" and "lool" share a verdict
+        collapsed = []
+        for char in text:
+            if len(collapsed) >= 2 and collapsed[-1] == char and collapsed[-2] == char:
+                continue
+            collapsed.append(char)
+        return "".join(collapsed)
+
+    def get(self, comment_text: str) -> Optional[Any]:
+        """Return the cached moderation result for a comment, or None."""
+        key = self.normalize(comment_text)
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return make_moderation_result(entry[1])
+
+    def put(self, comment_text: str, result: Any) -> None:
+        """Store the flagged categories and scores of a moderation result."""
+        scores = {}
+        if result.flagged:
+            for category in result.categories.__dict__:
+                if getattr(result.categories, category):
+                    scores[category] = getattr(result.category_scores, category)
+        key = self.normalize(comment_text)
+        self._entries[key] = (time.time(), scores)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def load(self) -> None:
+        """Load the non-expired verdicts saved in the cache file."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Failed to load verdict cache: {e}")
+            return
+        now = time.time()
+        for key, stored_at, scores in entries[-self.max_size:]:
+            if now - stored_at <= self.ttl:
+                self._entries[key] = (stored_at, scores)
+
+    def save(self) -> None:
+        """Write the verdicts to the cache file."""
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(
+                    [[key, stored_at, scores] for key, (stored_at, scores) in self._entries.items()],
+                    f,
+                    ensure_ascii=False
+                )
+        except OSError as e:
+            print(f"[ERROR] Failed to save verdict cache: {e}")